@@ -1,8 +1,8 @@
 from django.contrib import admin
-from unfold.admin import ModelAdmin
+from unfold.admin import ModelAdmin, TabularInline
 from .models import (
-    Category, Video, Photo, SliderItem, Like, Comment,
-    SubscriptionPlan, UserSubscription, Payment, Complaint
+    Category, Video, Photo, SliderItem, VideoLike, PhotoLike, VideoComment, PhotoComment,
+    SubscriptionPlan, UserSubscription, Payment, Complaint, Job, Rendition
 )
 from django.utils import timezone
 from datetime import timedelta
@@ -19,12 +19,24 @@ class CategoryAdmin(ModelAdmin):
 # ------------------------
 # Video
 # ------------------------
+class RenditionInline(TabularInline):
+    model = Rendition
+    extra = 0
+    can_delete = False
+    fields = ('name', 'width', 'height', 'bandwidth', 'status', 'updated_at')
+    readonly_fields = fields
+
+
 @admin.register(Video)
 class VideoAdmin(ModelAdmin):
-    list_display = ('title', 'category', 'views', 'created_at')
+    list_display = ('title', 'category', 'views', 'like_count', 'comment_count', 'created_at')
     list_filter = ('category', 'created_at')
     search_fields = ('title', 'description')
-    readonly_fields = ('views', 'created_at')
+    readonly_fields = (
+        'views', 'like_count', 'comment_count', 'created_at',
+        'width', 'height', 'video_codec', 'audio_codec', 'bitrate', 'probed_at', 'hls_manifest',
+    )
+    inlines = [RenditionInline]
 
 
 # ------------------------
@@ -32,10 +44,10 @@ class VideoAdmin(ModelAdmin):
 # ------------------------
 @admin.register(Photo)
 class PhotoAdmin(ModelAdmin):
-    list_display = ('title', 'category', 'created_at')
+    list_display = ('title', 'category', 'like_count', 'comment_count', 'created_at')
     list_filter = ('category', 'created_at')
     search_fields = ('title', 'description')
-    readonly_fields = ('created_at',)
+    readonly_fields = ('like_count', 'comment_count', 'created_at')
 
 
 # ------------------------
@@ -51,18 +63,30 @@ class SliderAdmin(ModelAdmin):
 # ------------------------
 # Likes
 # ------------------------
-@admin.register(Like)
-class LikeAdmin(ModelAdmin):
-    list_display = ('user', 'video', 'photo', 'created_at')
+@admin.register(VideoLike)
+class VideoLikeAdmin(ModelAdmin):
+    list_display = ('user', 'video', 'created_at')
+    readonly_fields = ('created_at',)
+
+
+@admin.register(PhotoLike)
+class PhotoLikeAdmin(ModelAdmin):
+    list_display = ('user', 'photo', 'created_at')
     readonly_fields = ('created_at',)
 
 
 # ------------------------
 # Comments
 # ------------------------
-@admin.register(Comment)
-class CommentAdmin(ModelAdmin):
-    list_display = ('user', 'video', 'photo', 'text', 'created_at')
+@admin.register(VideoComment)
+class VideoCommentAdmin(ModelAdmin):
+    list_display = ('user', 'video', 'text', 'created_at')
+    readonly_fields = ('created_at',)
+
+
+@admin.register(PhotoComment)
+class PhotoCommentAdmin(ModelAdmin):
+    list_display = ('user', 'photo', 'text', 'created_at')
     readonly_fields = ('created_at',)
 
 
@@ -109,3 +133,14 @@ class ComplaintAdmin(ModelAdmin):
     list_filter = ('resolved', 'created_at')
     search_fields = ('subject', 'message')
     readonly_fields = ('created_at',)
+
+
+# ------------------------
+# Job (tâches de fond)
+# ------------------------
+@admin.register(Job)
+class JobAdmin(ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'last_error')
+    readonly_fields = ('created_at', 'finished_at', 'locked_at', 'locked_by', 'last_error')
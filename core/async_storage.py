@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Accès asynchrone à R2 pour les vues ASGI (core.async_views).
+
+Les requêtes HTTP vers R2 passent par httpx.AsyncClient : aucune n'occupe un
+thread. Les URLs sont présignées localement avec le client boto3 partagé
+(calcul de signature, sans réseau). Ce qui reste bloquant (lecture des
+fichiers temporaires) tourne dans un pool de threads dédié et borné plutôt
+que dans l'executor par défaut de la boucle.
+
+Chaque boucle d'événements a son propre client httpx, fermé (aclose) à
+l'arrêt de la boucle : asyncio.run, utilisé par le serveur ASGI comme par
+async_to_sync, annule alors les tâches restantes, dont celle qui garde le
+client.
+"""
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree import ElementTree
+
+import httpx
+from django.conf import settings
+
+from .storage import MIN_PART_SIZE, get_presign_client
+
+logger = logging.getLogger(__name__)
+
+# Durée de validité des URLs présignées utilisées en interne
+PRESIGN_EXPIRES = 3600
+
+_executor = None
+_executor_lock = threading.Lock()
+# Boucle d'événements -> (client httpx, tâche qui le fermera)
+_http_clients = {}
+_http_clients_lock = threading.Lock()
+
+
+def get_blocking_executor():
+    """Pool de threads borné (ASYNC_BLOCKING_WORKERS) pour le code bloquant."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.ASYNC_BLOCKING_WORKERS,
+                    thread_name_prefix='async-blocking',
+                )
+    return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Exécute `func` dans le pool dédié sans bloquer la boucle d'événements."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_blocking_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+async def _close_with_loop(loop, client):
+    """Attend l'arrêt de la boucle (annulation de la tâche) puis ferme le client."""
+    try:
+        await loop.create_future()
+    finally:
+        with _http_clients_lock:
+            _http_clients.pop(loop, None)
+        await client.aclose()
+
+
+def get_http_client():
+    """Client httpx de la boucle d'événements courante."""
+    loop = asyncio.get_running_loop()
+    with _http_clients_lock:
+        entry = _http_clients.get(loop)
+        if entry is None:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.R2_MAX_POOL_CONNECTIONS,
+                    max_keepalive_connections=settings.R2_MAX_POOL_CONNECTIONS,
+                ),
+                timeout=httpx.Timeout(60.0, connect=10.0),
+            )
+            # La tâche est gardée ici : la boucle ne garde qu'une référence faible
+            entry = _http_clients[loop] = (client, loop.create_task(_close_with_loop(loop, client)))
+    return entry[0]
+
+
+def _presign(operation, http_method=None, **params):
+    return get_presign_client().generate_presigned_url(
+        operation,
+        Params={'Bucket': settings.AWS_STORAGE_BUCKET_NAME, **params},
+        ExpiresIn=PRESIGN_EXPIRES,
+        HttpMethod=http_method,
+    )
+
+
+async def _request(method, url, **kwargs):
+    response = await get_http_client().request(method, url, **kwargs)
+    response.raise_for_status()
+    return response
+
+
+async def _upload_part(key, upload_id, part_number, body):
+    url = _presign('upload_part', Key=key, UploadId=upload_id, PartNumber=part_number)
+    response = await _request('PUT', url, content=body)
+    return part_number, response.headers['ETag']
+
+
+def _complete_body(parts):
+    root = ElementTree.Element('CompleteMultipartUpload')
+    for part_number, etag in sorted(parts):
+        part = ElementTree.SubElement(root, 'Part')
+        ElementTree.SubElement(part, 'PartNumber').text = str(part_number)
+        ElementTree.SubElement(part, 'ETag').text = etag
+    return ElementTree.tostring(root)
+
+
+async def upload_async(uploaded_file, key, content_type=None):
+    """
+    Envoie un UploadedFile Django vers R2 sous `key`, sans bloquer la boucle.
+
+    Même découpage que core.storage.stream_upload : un seul PUT pour les
+    petits fichiers, sinon un upload multipart dont au plus
+    R2_MULTIPART_CONCURRENCY parts sont en vol (et en mémoire) à la fois.
+    """
+    part_size = max(settings.R2_MULTIPART_PART_SIZE, MIN_PART_SIZE)
+    concurrency = max(settings.R2_MULTIPART_CONCURRENCY, 1)
+    content_type = content_type or 'application/octet-stream'
+    headers = {'Content-Type': content_type}
+
+    await run_blocking(uploaded_file.seek, 0)
+
+    if uploaded_file.size is not None and uploaded_file.size <= part_size:
+        body = await run_blocking(uploaded_file.read)
+        url = _presign('put_object', http_method='PUT', Key=key, ContentType=content_type)
+        await _request('PUT', url, content=body, headers=headers)
+        return key
+
+    url = _presign('create_multipart_upload', http_method='POST', Key=key, ContentType=content_type)
+    response = await _request('POST', url, headers=headers)
+    upload_id = ElementTree.fromstring(response.content).findtext('{*}UploadId')
+
+    tasks = []
+    try:
+        pending = set()
+        part_number = 0
+        while True:
+            # On attend qu'une part se libère avant de lire la suivante
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+            chunk = await run_blocking(uploaded_file.read, part_size)
+            if not chunk:
+                break
+            part_number += 1
+            task = asyncio.ensure_future(_upload_part(key, upload_id, part_number, chunk))
+            pending.add(task)
+            tasks.append(task)
+        parts = await asyncio.gather(*tasks)
+
+        url = _presign('complete_multipart_upload', http_method='POST', Key=key, UploadId=upload_id)
+        await _request('POST', url, content=_complete_body(parts))
+    except BaseException:
+        logger.warning("Échec de l'upload multipart asynchrone %s, annulation.", key, exc_info=True)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            url = _presign('abort_multipart_upload', http_method='DELETE', Key=key, UploadId=upload_id)
+            await _request('DELETE', url)
+        except Exception:
+            logger.error("Impossible d'annuler l'upload multipart %s (%s)", key, upload_id, exc_info=True)
+        raise
+
+    return key
@@ -1,15 +1,15 @@
 # core/async_views.py
 import os
 import uuid
-import asyncio
+import httpx
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.core.files.storage import default_storage
 from django.conf import settings
 from .models import Video, Photo
-import boto3
-from botocore.exceptions import ClientError
+from .async_storage import upload_async
+from .jobs import aenqueue
 
 
 @csrf_exempt
@@ -41,8 +41,8 @@ async def async_upload_video(request):
             video_url = await upload_to_r2_async(video_file, video_filename)
             cover_url = await upload_to_r2_async(cover_image, cover_filename) if cover_image else None
             
-            # Création de l'objet Video avec les URLs
-            video = Video.objects.create(
+            # Création de l'objet Video avec les URLs (ORM asynchrone)
+            video = await Video.objects.acreate(
                 title=title,
                 description=description,
                 video_file=video_url,
@@ -50,6 +50,10 @@ async def async_upload_video(request):
                 duration=int(duration),
                 category_id=category_id if category_id else None
             )
+            # Analyse du fichier et miniatures hors requête (cf. core.tasks)
+            await aenqueue('media.probe', pk=video.id)
+            if cover_url:
+                await aenqueue('thumbnails.refresh', model='video', pk=video.id)
             
             return JsonResponse({
                 'success': True,
@@ -89,13 +93,14 @@ async def async_upload_photo(request):
             # Upload asynchrone vers R2
             image_url = await upload_to_r2_async(image_file, image_filename)
             
-            # Création de l'objet Photo avec l'URL
-            photo = Photo.objects.create(
+            # Création de l'objet Photo avec l'URL (ORM asynchrone)
+            photo = await Photo.objects.acreate(
                 title=title,
                 description=description,
-                image_file=image_url,
+                photo_file=image_url,
                 category_id=category_id if category_id else None
             )
+            await aenqueue('thumbnails.refresh', model='photo', pk=photo.id)
             
             return JsonResponse({
                 'success': True,
@@ -112,34 +117,13 @@ async def async_upload_photo(request):
 async def upload_to_r2_async(file, filename):
     """
     Fonction asynchrone pour uploader un fichier vers R2
+    (HTTP non bloquant, envoi du fichier par parts)
     """
-    # Configuration du client S3 pour R2
-    s3_client = boto3.client(
-        's3',
-        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        region_name='auto'
-    )
-    
     try:
-        # Lecture du contenu du fichier
-        file_content = file.read()
-        
-        # Upload asynchrone vers R2
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(
-            None,
-            lambda: s3_client.put_object(
-                Bucket=settings.AWS_STORAGE_BUCKET_NAME,
-                Key=filename,
-                Body=file_content,
-                ContentType=file.content_type
-            )
-        )
-        
+        await upload_async(file, filename, content_type=file.content_type)
+
         # Retour de l'URL du fichier
         return f"{settings.MEDIA_URL}{filename}"
-    
-    except ClientError as e:
-        raise Exception(f"Erreur lors de l'upload vers R2: {e}")
\ No newline at end of file
+
+    except httpx.HTTPError as e:
+        raise Exception(f"Erreur lors de l'upload vers R2: {e}")
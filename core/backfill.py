@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Recopie des anciennes tables Like / Comment (vidéo OU photo, l'autre clé
+à NULL) vers VideoLike / PhotoLike / VideoComment / PhotoComment.
+
+La copie se fait par tranches de BATCH_SIZE id, une transaction par
+tranche : pas de verrou long sur les tables en service. Les id sont
+conservés (les id de commentaires sont exposés par l'API) et une ligne déjà
+copiée est ignorée : la copie peut être relancée sans risque. Un id déjà
+pris dans la nouvelle table par une autre ligne (ID_GAP dépassé) arrête la
+copie (BackfillConflict) au lieu d'être ignoré.
+
+Déploiement sans interruption :
+
+1. migrate : création des tables (0011), copie et réservation des id (0012) ;
+2. les anciens processus écrivent encore dans Like / Comment jusqu'à leur
+   arrêt : une fois le déploiement terminé,
+
+       python manage.py backfill_interactions
+       python manage.py reconcile_counters
+
+   recopie ces dernières lignes, supprime des nouvelles tables les likes et
+   commentaires supprimés entre-temps dans les anciennes (delete_missing),
+   puis recale les compteurs.
+
+Sur PostgreSQL, les nouvelles tables numérotent leurs lignes à partir du
+plus grand id copié + ID_GAP : les lignes écrites entre-temps par les
+anciens processus gardent un id libre.
+"""
+from django.db import transaction
+from django.db.migrations.recorder import MigrationRecorder
+
+BATCH_SIZE = 2000
+
+# Id laissés libres entre les lignes copiées et les nouvelles
+ID_GAP = 100_000
+
+# Migration de la copie initiale : sa date d'application sépare les lignes
+# copiées des lignes écrites par le nouveau code
+COPY_MIGRATION = '0012_copy_likes_comments'
+
+# (ancien modèle, clé étrangère, nouveau modèle, colonnes copiées en plus de l'id)
+SPLITS = [
+    ('Like', 'video', 'VideoLike', ['user_id', 'video_id', 'created_at']),
+    ('Like', 'photo', 'PhotoLike', ['user_id', 'photo_id', 'created_at']),
+    ('Comment', 'video', 'VideoComment', ['user_id', 'video_id', 'text', 'created_at']),
+    ('Comment', 'photo', 'PhotoComment', ['user_id', 'photo_id', 'text', 'created_at']),
+]
+
+
+class BackfillConflict(Exception):
+    """Id d'une ancienne ligne déjà pris par une autre ligne de la nouvelle table."""
+
+
+def _tables(apps, old_name, new_name):
+    return apps.get_model('core', old_name)._meta.db_table, apps.get_model('core', new_name)._meta.db_table
+
+
+def _max_id(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+        return cursor.fetchone()[0]
+
+
+def copy_rows(apps, connection, batch_size=BATCH_SIZE):
+    """Recopie les lignes manquantes ; renvoie {nouveau modèle: lignes copiées}."""
+    copied = {}
+    for old_name, fk, new_name, columns in SPLITS:
+        old_table, new_table = _tables(apps, old_name, new_name)
+        column_list = ', '.join(['id', *columns])
+        # INSERT ... SELECT : les valeurs (created_at compris) sont copiées
+        # telles quelles, sans passer par Python ni par auto_now_add
+        sql = (
+            f"INSERT INTO {new_table} ({column_list}) "
+            f"SELECT {column_list} FROM {old_table} "
+            f"WHERE {fk}_id IS NOT NULL AND id > %s AND id <= %s "
+            f"ON CONFLICT DO NOTHING"
+        )
+        # Ancienne ligne ignorée par ON CONFLICT alors que l'id porte une autre ligne
+        conflicts_sql = (
+            f"SELECT o.id FROM {old_table} o JOIN {new_table} n ON n.id = o.id "
+            f"WHERE o.{fk}_id IS NOT NULL AND o.id > %s AND o.id <= %s "
+            f"AND (n.{fk}_id <> o.{fk}_id OR n.user_id <> o.user_id)"
+        )
+        total = 0
+        for low in range(0, _max_id(connection, old_table), batch_size):
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute(sql, [low, low + batch_size])
+                total += max(cursor.rowcount, 0)
+                cursor.execute(conflicts_sql, [low, low + batch_size])
+                conflicts = [row[0] for row in cursor.fetchmany(10)]
+            if conflicts:
+                raise BackfillConflict(
+                    f"{old_table} -> {new_table} : id déjà pris par d'autres lignes "
+                    f"({', '.join(map(str, conflicts))}, ...) ; ID_GAP dépassé ?"
+                )
+        copied[new_name] = total
+    return copied
+
+
+def copy_cutover(connection):
+    """Date d'application de la copie initiale (None si la migration n'a pas tourné)."""
+    recorder = MigrationRecorder(connection)
+    if not recorder.has_table():
+        return None
+    return recorder.migration_qs.filter(app='core', name=COPY_MIGRATION).values_list('applied', flat=True).first()
+
+
+def delete_missing(apps, connection, cutover, batch_size=BATCH_SIZE):
+    """
+    Supprime des nouvelles tables les lignes copiées (créées avant `cutover`)
+    qui n'existent plus dans l'ancienne table : likes retirés et commentaires
+    supprimés par les anciens processus. Renvoie {nouveau modèle: lignes supprimées}.
+
+    Les lignes écrites par le nouveau code sont toutes postérieures à la
+    copie initiale : elles ne sont jamais touchées. Les compteurs sont à
+    recaler ensuite (reconcile_counters).
+    """
+    deleted = {}
+    for old_name, fk, new_name, _ in SPLITS:
+        old_table, new_table = _tables(apps, old_name, new_name)
+        sql = (
+            f"DELETE FROM {new_table} WHERE id > %s AND id <= %s AND created_at < %s "
+            f"AND NOT EXISTS (SELECT 1 FROM {old_table} o WHERE o.id = {new_table}.id AND o.{fk}_id IS NOT NULL)"
+        )
+        total = 0
+        for low in range(0, _max_id(connection, new_table), batch_size):
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute(sql, [low, low + batch_size, cutover])
+                total += max(cursor.rowcount, 0)
+        deleted[new_name] = total
+    return deleted
+
+
+def reserve_ids(apps, connection):
+    """PostgreSQL : fait démarrer les nouvelles tables après les id copiés + ID_GAP."""
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for old_name, _, new_name, _ in SPLITS:
+            old_table, new_table = _tables(apps, old_name, new_name)
+            cursor.execute(
+                f"""
+                SELECT setval(pg_get_serial_sequence(%s, 'id'), GREATEST(
+                    (SELECT COALESCE(MAX(id), 0) FROM {old_table}),
+                    (SELECT COALESCE(MAX(id), 0) FROM {new_table})
+                ) + %s)
+                """,
+                [new_table, ID_GAP],
+            )
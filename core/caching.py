@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Cache à deux niveaux pour les valeurs chaudes (page d'accueil, ...).
+
+1. Un LRU en mémoire du processus (CACHE_LOCAL_MAX_ENTRIES entrées,
+   CACHE_LOCAL_TTL secondes au plus) évite un aller-retour vers le cache
+   partagé à chaque requête.
+2. Le cache partagé (CACHES['default'] : Redis si REDIS_URL, sinon LocMem)
+   conserve la valeur avec sa date d'expiration logique et le temps qu'a
+   pris son calcul, CACHE_STALE_GRACE secondes au-delà de cette date.
+
+Expiration anticipée probabiliste (« XFetch ») : un lecteur peut décider de
+recalculer avant l'expiration, d'autant plus tôt que le calcul est long ;
+les recalculs s'étalent au lieu de tomber tous au même instant.
+
+Un seul recalcul à la fois par clé (verrou cache.add) : pendant ce temps,
+les autres lecteurs servent l'ancienne valeur. Si aucune valeur n'existe
+encore, ils attendent celle du premier, au plus CACHE_LOCK_TIMEOUT secondes.
+
+Le niveau local n'est pas invalidé dans les autres processus : une
+invalidation y est visible après CACHE_LOCAL_TTL secondes au plus. Les
+données qui doivent changer immédiatement partout (droits d'abonnement)
+restent sur le cache partagé seul.
+"""
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .db_router import use_primary
+
+# Intervalle (secondes) entre deux lectures en attendant le premier calcul
+WAIT_INTERVAL = 0.05
+
+
+class LocalLRU:
+    """LRU thread-safe avec expiration par entrée."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = LocalLRU(settings.CACHE_LOCAL_MAX_ENTRIES)
+
+
+def _expired_early(expires_at, delta):
+    """XFetch : vrai si ce lecteur doit recalculer maintenant."""
+    beta = settings.CACHE_EARLY_EXPIRY_BETA
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+
+def _keep_local(key, envelope):
+    remaining = envelope[1] - time.time()
+    local_cache.set(key, envelope, min(settings.CACHE_LOCAL_TTL, remaining))
+
+
+def _build(key, builder, ttl):
+    started = time.monotonic()
+    # Valeur partagée par tous : jamais calculée sur un réplica en retard
+    with use_primary():
+        value = builder()
+    # (valeur, expiration logique, durée du calcul)
+    envelope = (value, time.time() + ttl, time.monotonic() - started)
+    cache.set(key, envelope, ttl + settings.CACHE_STALE_GRACE)
+    _keep_local(key, envelope)
+    return value
+
+
+def get_or_set(key, builder, ttl):
+    """Valeur de `key`, calculée par `builder()` si besoin et gardée `ttl` secondes."""
+    envelope = local_cache.get(key)
+    if envelope is not None:
+        return envelope[0]
+
+    envelope = cache.get(key)
+    if envelope is not None and not _expired_early(envelope[1], envelope[2]):
+        _keep_local(key, envelope)
+        return envelope[0]
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT):
+        try:
+            return _build(key, builder, ttl)
+        finally:
+            cache.delete(lock_key)
+
+    # Un autre lecteur recalcule
+    if envelope is not None:
+        return envelope[0]
+    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        envelope = cache.get(key)
+        if envelope is not None:
+            _keep_local(key, envelope)
+            return envelope[0]
+    # Le calcul en cours n'a pas abouti (processus arrêté ?)
+    return _build(key, builder, ttl)
+
+
+def invalidate(key):
+    cache.delete(key)
+    local_cache.delete(key)
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Lectures sur les réplicas PostgreSQL (DB_REPLICA_HOSTS) pour les pages
+de flux et de recherche.
+
+Tout passe par la base principale (alias « default »), sauf les requêtes
+de lecture des vues décorées par @read_from_replica (index, flux, recherche,
+commentaires), qui vont sur un réplica choisi une fois par requête HTTP.
+
+Un réplica a un peu de retard sur la principale. Pour qu'un visiteur voie
+tout de suite ce qu'il vient d'écrire (like, commentaire, upload) :
+
+- dès qu'une écriture a lieu pendant la requête, les lectures suivantes
+  repassent sur la principale ;
+- après une requête qui écrit (ou un POST, PUT, ...), ReplicaStickinessMiddleware
+  pose un cookie qui garde ce visiteur sur la principale pendant
+  DB_REPLICA_STICKY_SECONDS secondes.
+
+Les sessions restent sur la principale. Les calculs mis en cache pour tout
+le monde (page d'accueil, droits d'abonnement) se font avec use_primary() :
+un réplica en retard ne doit pas remettre en cache une valeur périmée
+juste après une invalidation.
+
+Sans réplica configuré, le routeur renvoie toujours « default ».
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = 'db_primary_until'
+
+# Applications dont les lectures ne vont jamais sur un réplica
+PRIMARY_ONLY_APPS = {'sessions'}
+
+
+@dataclass
+class RoutingState:
+    replica: str = None   # alias du réplica de la requête (None = principale)
+    primary: bool = False  # visiteur collé à la principale (cookie)
+    wrote: bool = False    # écriture pendant la requête
+
+
+# Objet mutable : les threads de sync_to_async (ASGI) partagent le même état
+_state = ContextVar('db_routing_state', default=None)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+@contextmanager
+def request_scope(primary=False):
+    """État de routage d'une requête HTTP (cf. ReplicaStickinessMiddleware)."""
+    state = RoutingState(primary=primary)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def replica_reads():
+    """Lectures sur un réplica dans ce bloc, sauf visiteur collé à la principale."""
+    state = _state.get()
+    token = None
+    if state is None:
+        # Hors requête HTTP (tests, shell)
+        state = RoutingState()
+        token = _state.set(state)
+    previous = state.replica
+    aliases = replica_aliases()
+    if aliases and not state.primary:
+        state.replica = previous or random.choice(aliases)
+    try:
+        yield
+    finally:
+        state.replica = previous
+        if token is not None:
+            _state.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Lectures sur la principale dans ce bloc, même dans une vue décorée."""
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    previous, state.replica = state.replica, None
+    try:
+        yield
+    finally:
+        state.replica = previous
+
+
+def read_from_replica(view):
+    """Décorateur des vues en lecture seule (flux, recherche)."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def is_sticky(request):
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def make_sticky(response):
+    seconds = settings.DB_REPLICA_STICKY_SECONDS
+    response.set_cookie(
+        STICKY_COOKIE, f"{time.time() + seconds:.3f}",
+        max_age=seconds, httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+    )
+
+
+class ReplicaRouter:
+    """Routeur (DATABASE_ROUTERS) : écritures sur la principale, lectures selon l'état de la requête."""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None or not state.replica or state.wrote
+            or model._meta.app_label in PRIMARY_ONLY_APPS
+        ):
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas et principale contiennent les mêmes données
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Les réplicas suivent la principale par réplication PostgreSQL
+        return None if db == DEFAULT_DB_ALIAS else False
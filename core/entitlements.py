@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Droits d'accès liés à l'abonnement, mis en cache par utilisateur.
+
+La date de fin de l'abonnement actif de chaque utilisateur est conservée
+dans le cache Django (une requête SQL au plus par utilisateur et par
+période de cache). La durée de vie de l'entrée ne dépasse jamais la fin de
+l'abonnement, et l'entrée est invalidée dès qu'un UserSubscription ou un
+Payment de l'utilisateur change (core.signals).
+
+Les vues y accèdent via request.entitlements (stream.middleware.EntitlementMiddleware).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .db_router import use_primary
+
+CACHE_KEY = 'entitlements:{user_id}'
+
+# Valeur en cache pour « aucun abonnement actif » (None = absent du cache)
+NO_SUBSCRIPTION = 'none'
+
+
+def _cache_key(user_id):
+    return CACHE_KEY.format(user_id=user_id)
+
+
+def get_subscription_end(user_id):
+    """Date de fin de l'abonnement actif de l'utilisateur, ou None."""
+    from .models import UserSubscription
+
+    cached = cache.get(_cache_key(user_id))
+    if cached is not None:
+        return None if cached == NO_SUBSCRIPTION else cached
+
+    # Relu sur la principale : l'entrée vient peut-être d'être invalidée par un paiement
+    with use_primary():
+        end_date = (
+            UserSubscription.objects.filter(user_id=user_id, is_active=True)
+            .values_list('end_date', flat=True)
+            .first()
+        )
+    timeout = settings.ENTITLEMENT_CACHE_TTL
+    if end_date is not None:
+        remaining = (end_date - timezone.now()).total_seconds()
+        if remaining > 0:
+            # Expire au plus tard à la fin de l'abonnement
+            timeout = max(1, min(timeout, int(remaining)))
+    cache.set(_cache_key(user_id), end_date or NO_SUBSCRIPTION, timeout)
+    return end_date
+
+
+def invalidate(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+class Entitlements:
+    """Droits de l'utilisateur de la requête, calculés au premier accès."""
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def subscription_end_date(self):
+        if not self.user.is_authenticated:
+            return None
+        return get_subscription_end(self.user.pk)
+
+    @property
+    def has_active_subscription(self):
+        end_date = self.subscription_end_date
+        return end_date is not None and end_date > timezone.now()
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Packaging HLS (débit adaptatif) des vidéos.
+
+Activé par HLS_ENABLED. Après l'analyse d'une vidéo (tâche media.probe), la
+tâche video.package_hls :
+
+1. télécharge l'original de R2 dans un dossier temporaire ;
+2. lance ffmpeg une seule fois (un décodage, un encodage par qualité) pour
+   produire les qualités de HLS_LADDER qui ne dépassent pas la hauteur de la
+   source, découpées en segments de HLS_SEGMENT_SECONDS, et la playlist
+   maîtresse ;
+3. envoie le tout sous hls/<id vidéo>/<version>/ ;
+4. renseigne Video.hls_manifest et les Rendition, puis supprime l'ancien
+   packaging.
+
+Chaque packaging a son propre préfixe : les fichiers ne changent jamais et
+sont servis avec un Cache-Control immuable.
+"""
+import os
+import posixpath
+import subprocess
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Rendition, Video
+from .storage import get_s3_client, key_from_url, public_url
+
+MASTER_PLAYLIST = 'master.m3u8'
+
+CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+}
+
+
+class PackagingError(Exception):
+    pass
+
+
+def ladder_for(video):
+    """Qualités (nom, hauteur, débit vidéo en kbit/s) à produire pour `video`."""
+    ladder = sorted(settings.HLS_LADDER, reverse=True)
+    if video.height:
+        fitting = [rung for rung in ladder if rung[0] <= video.height]
+        # Source plus petite que la plus petite qualité : on garde celle-ci
+        ladder = fitting or ladder[-1:]
+    return [(f"{height}p", height, kbps) for height, kbps in ladder]
+
+
+def _scaled_width(video, height):
+    if not video.width or not video.height:
+        return None
+    return max(2, round(video.width * height / video.height / 2) * 2)
+
+
+def ffmpeg_command(source, output_dir, rungs, has_audio):
+    count = len(rungs)
+    filters = [f"[0:v]split={count}" + ''.join(f"[v{i}]" for i in range(count))]
+    filters += [f"[v{i}]scale=-2:{height}[v{i}out]" for i, (_, height, _) in enumerate(rungs)]
+
+    command = [
+        settings.FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error', '-y',
+        '-i', source,
+        '-filter_complex', ';'.join(filters),
+    ]
+    stream_map = []
+    for i, (name, _, kbps) in enumerate(rungs):
+        command += [
+            '-map', f"[v{i}out]",
+            f"-c:v:{i}", 'libx264',
+            f"-b:v:{i}", f"{kbps}k",
+            f"-maxrate:v:{i}", f"{kbps * 107 // 100}k",
+            f"-bufsize:v:{i}", f"{kbps * 3 // 2}k",
+        ]
+        if has_audio:
+            command += ['-map', '0:a:0', f"-c:a:{i}", 'aac', f"-b:a:{i}", f"{settings.HLS_AUDIO_KBPS}k"]
+            stream_map.append(f"v:{i},a:{i},name:{name}")
+        else:
+            stream_map.append(f"v:{i},name:{name}")
+
+    segment = settings.HLS_SEGMENT_SECONDS
+    command += [
+        '-preset', settings.HLS_X264_PRESET,
+        '-pix_fmt', 'yuv420p',
+        # Images clés alignées sur les segments, identiques dans toutes les qualités
+        '-force_key_frames', f"expr:gte(t,n_forced*{segment})",
+        '-sc_threshold', '0',
+        '-f', 'hls',
+        '-hls_time', str(segment),
+        '-hls_playlist_type', 'vod',
+        '-hls_flags', 'independent_segments',
+        '-hls_segment_filename', os.path.join(output_dir, '%v', 'seg_%05d.ts'),
+        '-master_pl_name', MASTER_PLAYLIST,
+        '-var_stream_map', ' '.join(stream_map),
+        os.path.join(output_dir, '%v', 'index.m3u8'),
+    ]
+    return command
+
+
+def _upload_tree(s3, directory, prefix):
+    uploads = []
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            path = os.path.join(root, filename)
+            relative = os.path.relpath(path, directory).replace(os.sep, '/')
+            content_type = CONTENT_TYPES.get(posixpath.splitext(filename)[1], 'application/octet-stream')
+            uploads.append((path, f"{prefix}/{relative}", content_type))
+
+    def upload(item):
+        path, key, content_type = item
+        s3.upload_file(
+            path, settings.AWS_STORAGE_BUCKET_NAME, key,
+            ExtraArgs={'ContentType': content_type, 'CacheControl': 'public, max-age=31536000, immutable'},
+        )
+
+    # Le client partagé est thread-safe ; son pool est dimensionné pour ça
+    with ThreadPoolExecutor(max_workers=settings.R2_MULTIPART_CONCURRENCY) as executor:
+        list(executor.map(upload, uploads))
+
+
+def key_package_prefix(key):
+    """Préfixe hls/<id>/<version> d'une clé R2 (vide hors packaging HLS)."""
+    parts = key.split('/') if key else []
+    if len(parts) < 4 or parts[0] != 'hls':
+        return ''
+    return '/'.join(parts[:3])
+
+
+def package_prefix(url):
+    """Préfixe hls/<id>/<version> d'une URL de playlist (vide si ce n'en est pas une)."""
+    return key_package_prefix(key_from_url(url))
+
+
+def package_video(video):
+    """
+    Produit et publie le packaging HLS de `video`. Renvoie les préfixes R2
+    des packagings devenus inutiles (à supprimer).
+    """
+    source_url = video.video_file
+    key = key_from_url(source_url)
+    if not key:
+        return []
+
+    rungs = ladder_for(video)
+    # Vidéo non analysée : on suppose une piste audio
+    has_audio = bool(video.audio_codec) or video.probed_at is None
+    audio_bps = settings.HLS_AUDIO_KBPS * 1000 if has_audio else 0
+    stale_prefixes = {package_prefix(r.playlist) for r in video.renditions.all()} - {''}
+
+    with transaction.atomic():
+        video.renditions.exclude(name__in=[name for name, _, _ in rungs]).delete()
+        for name, height, kbps in rungs:
+            Rendition.objects.update_or_create(
+                video=video, name=name,
+                defaults={
+                    'height': height,
+                    'width': _scaled_width(video, height),
+                    'bandwidth': kbps * 1000 + audio_bps,
+                    'status': Rendition.PROCESSING,
+                },
+            )
+
+    prefix = f"hls/{video.pk}/{uuid.uuid4().hex[:12]}"
+    s3 = get_s3_client()
+    try:
+        with tempfile.TemporaryDirectory(prefix='hls-', dir=settings.HLS_WORK_DIR) as workdir:
+            source = os.path.join(workdir, 'source')
+            output_dir = os.path.join(workdir, 'out')
+            # Téléchargement en plusieurs parts parallèles, directement sur disque
+            s3.download_file(settings.AWS_STORAGE_BUCKET_NAME, key, source)
+            result = subprocess.run(
+                ffmpeg_command(source, output_dir, rungs, has_audio),
+                capture_output=True, text=True, timeout=settings.HLS_TIMEOUT,
+            )
+            if result.returncode != 0:
+                raise PackagingError(f"ffmpeg ({result.returncode}) : {result.stderr[-2000:]}")
+            _upload_tree(s3, output_dir, prefix)
+    except Exception:
+        video.renditions.update(status=Rendition.FAILED)
+        raise
+
+    with transaction.atomic():
+        # La vidéo a pu être remplacée pendant l'encodage : on ne publie pas
+        published = Video.objects.filter(pk=video.pk, video_file=source_url).update(
+            hls_manifest=public_url(f"{prefix}/{MASTER_PLAYLIST}"),
+            updated_at=timezone.now(),
+        )
+        if not published:
+            return [prefix]
+        for name, _, _ in rungs:
+            video.renditions.filter(name=name).update(
+                playlist=public_url(f"{prefix}/{name}/index.m3u8"),
+                status=Rendition.READY,
+            )
+    return sorted(stale_prefixes)
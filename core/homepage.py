@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Instantané de la page d'accueil (index et home), mis en cache.
+
+Les dernières vidéos, la grille de photos et la liste des slides sont
+calculées une fois puis servies depuis le cache à deux niveaux
+(core.caching) jusqu'à ce qu'une vidéo, une photo ou un élément du slider
+change (core.signals) ou que HOMEPAGE_CACHE_TTL expire ; un seul worker
+recalcule alors l'instantané pendant que les autres servent l'ancien.
+
+Les éléments propres à l'utilisateur (abonnement, likes) ne font pas partie
+de l'instantané : les vues les ajoutent après coup.
+"""
+from django.conf import settings
+
+from . import caching
+
+CACHE_KEY = 'homepage:snapshot'
+
+LATEST_VIDEOS = 6
+LATEST_PHOTOS = 12
+FALLBACK_SLIDES = 5
+
+
+def _slide(video):
+    return {'image': video.cover_image, 'text': video.title, 'video_id': video.id}
+
+
+def build_snapshot():
+    from .models import Photo, SliderItem, Video
+
+    videos = list(Video.objects.for_feed()[:LATEST_VIDEOS])
+    photos = list(Photo.objects.for_feed()[:LATEST_PHOTOS])
+    slider_items = SliderItem.objects.select_related('video').defer('video__search_vector')
+
+    slides = [_slide(item.video) for item in slider_items if item.video and item.video.cover_image]
+    if not slides:
+        slides = [_slide(video) for video in videos[:FALLBACK_SLIDES] if video.cover_image]
+
+    return {'videos': videos, 'photos': photos, 'slides': slides}
+
+
+def get_snapshot():
+    return caching.get_or_set(CACHE_KEY, build_snapshot, settings.HOMEPAGE_CACHE_TTL)
+
+
+def invalidate():
+    caching.invalidate(CACHE_KEY)
+
+
+def absolute_slides(request, slides):
+    """Les URLs relatives des slides dépendent de l'hôte de la requête."""
+    return [
+        slide if slide['image'].startswith('http')
+        else {**slide, 'image': request.build_absolute_uri(slide['image'])}
+        for slide in slides
+    ]
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+File de tâches de fond stockée en base (modèle Job).
+
+Les vues enregistrent le travail lent (miniatures, suppression d'objets R2,
+...) avec enqueue() et répondent tout de suite ; la commande
+
+    python manage.py run_jobs --concurrency 4
+
+réclame les tâches prêtes (SELECT ... FOR UPDATE SKIP LOCKED sur PostgreSQL),
+les exécute dans un pool de threads et les relance avec un délai
+exponentiel en cas d'erreur, jusqu'à max_attempts.
+
+Les fonctions exécutables sont déclarées avec @task (voir core.tasks).
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Task:
+    name: str
+    func: object
+    max_attempts: int
+    concurrency: int = None  # max d'exécutions simultanées par worker (None = pas de limite)
+
+
+_registry = {}
+
+
+def task(name, max_attempts=5, concurrency=None):
+    """Déclare une fonction exécutable par la file sous le nom `name`."""
+    def decorator(func):
+        _registry[name] = Task(name, func, max_attempts, concurrency)
+        return func
+    return decorator
+
+
+def get_task(name):
+    return _registry[name]
+
+
+def enqueue(name, delay=0, **payload):
+    """Ajoute une tâche ; à appeler dans la transaction qui écrit les données concernées."""
+    from .models import Job
+
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=get_task(name).max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def enqueue_many(name, payloads, delay=0):
+    """Ajoute une tâche `name` par payload, en une seule requête INSERT."""
+    from .models import Job
+
+    run_at = timezone.now() + timedelta(seconds=delay)
+    max_attempts = get_task(name).max_attempts
+    return Job.objects.bulk_create([
+        Job(name=name, payload=payload, max_attempts=max_attempts, run_at=run_at)
+        for payload in payloads
+    ])
+
+
+async def aenqueue(name, delay=0, **payload):
+    """Variante de enqueue() pour les vues asynchrones (ORM asynchrone)."""
+    from .models import Job
+
+    return await Job.objects.acreate(
+        name=name,
+        payload=payload,
+        max_attempts=get_task(name).max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def backoff_delay(attempts):
+    """Délai avant la tentative suivante : JOB_RETRY_BASE_DELAY * 2^(n-1), plafonné."""
+    return min(settings.JOB_RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0), settings.JOB_RETRY_MAX_DELAY)
+
+
+def stats():
+    """Nombre de tâches par statut (introspection, commande run_jobs --stats)."""
+    from .models import Job
+
+    return dict(Job.objects.order_by().values_list('status').annotate(total=Count('id')))
+
+
+def _at_limit(name, count):
+    task = _registry.get(name)
+    return bool(task and task.concurrency and count >= task.concurrency)
+
+
+def claim(worker_id, limit, running=None):
+    """
+    Réserve jusqu'à `limit` tâches prêtes pour ce worker, sans dépasser la
+    concurrence de chaque tâche compte tenu de `running` (nom -> exécutions
+    en cours dans ce worker).
+    """
+    from .models import Job
+
+    running = dict(running or {})
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    ready = (
+        Q(status=Job.PENDING, run_at__lte=now)
+        # Tâches d'un worker arrêté brutalement
+        | Q(status=Job.RUNNING, locked_at__lt=stale)
+    )
+    saturated = [name for name, count in running.items() if _at_limit(name, count)]
+    with transaction.atomic():
+        candidates = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(ready)
+            .exclude(name__in=saturated)
+            .order_by('run_at', 'id')[:limit]
+        )
+        jobs = []
+        for job in candidates:
+            # Limite atteinte dans ce lot : la tâche reste en attente
+            if _at_limit(job.name, running.get(job.name, 0)):
+                continue
+            running[job.name] = running.get(job.name, 0) + 1
+            jobs.append(job)
+        for job in jobs:
+            job.status = Job.RUNNING
+            job.locked_at = now
+            job.locked_by = worker_id
+            job.attempts += 1
+        Job.objects.bulk_update(jobs, ['status', 'locked_at', 'locked_by', 'attempts'])
+    return jobs
+
+
+def run_job(job):
+    """Exécute une tâche réservée et enregistre son résultat."""
+    from .models import Job
+
+    # Seule la réservation en cours peut conclure : une tâche reprise par un
+    # autre worker (JOB_LOCK_TIMEOUT dépassé) a un autre locked_by / attempts
+    claimed = Job.objects.filter(pk=job.pk, locked_by=job.locked_by, attempts=job.attempts)
+    try:
+        get_task(job.name).func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.error("Tâche %s #%s en échec (tentative %s/%s)", job.name, job.pk, job.attempts, job.max_attempts, exc_info=True)
+        if job.attempts >= job.max_attempts:
+            updated = claimed.update(
+                status=Job.FAILED, last_error=error, finished_at=timezone.now(), locked_at=None
+            )
+        else:
+            updated = claimed.update(
+                status=Job.PENDING,
+                last_error=error,
+                locked_at=None,
+                run_at=timezone.now() + timedelta(seconds=backoff_delay(job.attempts)),
+            )
+        result = False
+    else:
+        updated = claimed.update(
+            status=Job.SUCCEEDED, finished_at=timezone.now(), locked_at=None, last_error=''
+        )
+        result = True
+    finally:
+        close_old_connections()
+    if not updated:
+        logger.warning("Tâche %s #%s reprise par un autre worker : résultat ignoré", job.name, job.pk)
+    return result
+
+
+class Worker:
+    """Boucle de réservation / exécution utilisée par la commande run_jobs."""
+
+    def __init__(self, concurrency=4, poll_interval=1.0):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._running = {}  # nom de tâche -> exécutions en cours
+        self._running_ids = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _execute(self, job):
+        try:
+            run_job(job)
+        finally:
+            with self._lock:
+                self._running[job.name] -= 1
+                self._running_ids.discard(job.pk)
+
+    def _heartbeat(self):
+        """
+        Repousse locked_at des tâches en cours : une tâche plus longue que
+        JOB_LOCK_TIMEOUT (packaging HLS) n'est pas reprise par un autre worker.
+        """
+        from .models import Job
+
+        with self._lock:
+            pks = list(self._running_ids)
+        if pks:
+            Job.objects.filter(pk__in=pks, locked_by=self.worker_id, status=Job.RUNNING).update(
+                locked_at=timezone.now()
+            )
+
+    def run(self, once=False):
+        """
+        Traite les tâches jusqu'à stop() (ou jusqu'à épuisement si `once`).
+        Après stop(), attend la fin des tâches en cours sans en réserver.
+        """
+        last_heartbeat = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job') as executor:
+            while True:
+                with self._lock:
+                    busy = sum(self._running.values())
+                    running = dict(self._running)
+                stopping = self._stopping.is_set()
+                if stopping and not busy:
+                    break
+                free = 0 if stopping else self.concurrency - busy
+                jobs = claim(self.worker_id, free, running) if free > 0 else []
+                for job in jobs:
+                    with self._lock:
+                        self._running[job.name] = self._running.get(job.name, 0) + 1
+                        self._running_ids.add(job.pk)
+                    executor.submit(self._execute, job)
+                if not jobs:
+                    if once and not busy:
+                        break
+                    time.sleep(self.poll_interval)
+                if time.monotonic() - last_heartbeat >= settings.JOB_HEARTBEAT_INTERVAL:
+                    self._heartbeat()
+                    last_heartbeat = time.monotonic()
+                close_old_connections()
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Recopie les likes et commentaires des anciennes tables Like / Comment vers
+VideoLike / PhotoLike / VideoComment / PhotoComment (cf. core.backfill).
+Sans risque à relancer : les lignes déjà copiées sont ignorées, et les
+lignes copiées puis supprimées des anciennes tables (like retiré,
+commentaire supprimé) sont supprimées des nouvelles.
+
+    python manage.py backfill_interactions [--batch-size 2000] [--database default]
+"""
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.backfill import BATCH_SIZE, BackfillConflict, copy_cutover, copy_rows, delete_missing
+
+
+class Command(BaseCommand):
+    help = "Recopie Like / Comment dans les tables par type de contenu."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Id par transaction.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help="Base à traiter.")
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        cutover = copy_cutover(connection)
+        if cutover is None:
+            raise CommandError("Copie initiale absente : lancer d'abord migrate.")
+
+        try:
+            copied = copy_rows(apps, connection, batch_size=options['batch_size'])
+        except BackfillConflict as exc:
+            raise CommandError(str(exc))
+        deleted = delete_missing(apps, connection, cutover, batch_size=options['batch_size'])
+        for model_name, total in copied.items():
+            self.stdout.write(
+                f"{model_name}: {total} ligne(s) copiée(s), {deleted[model_name]} supprimée(s)"
+            )
+        self.stdout.write(self.style.SUCCESS("Recopie terminée (lancer ensuite reconcile_counters)."))
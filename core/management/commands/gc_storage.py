@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Supprime du bucket R2 les objets qui ne sont plus référencés en base
+(cf. core.storage_gc).
+
+    python manage.py gc_storage --dry-run [--verbose]
+    python manage.py gc_storage [--prefix videos/ --prefix covers/] [--min-age 48]
+"""
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from core.storage_gc import collect_garbage
+
+
+class Command(BaseCommand):
+    help = "Supprime les objets R2 orphelins et les uploads multipart abandonnés."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Rapport seulement, rien n'est supprimé.")
+        parser.add_argument('--prefix', action='append', dest='prefixes', help="Préfixe à parcourir (répétable, défaut : GC_PREFIXES).")
+        parser.add_argument('--min-age', type=int, dest='min_age', help="Âge minimum en heures (défaut : GC_MIN_AGE_HOURS).")
+        parser.add_argument('--verbose', action='store_true', help="Liste chaque objet orphelin.")
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        def on_orphan(obj):
+            if options['verbose']:
+                self.stdout.write(f"  {obj['Key']} ({filesizeformat(obj['Size'])}, {obj['LastModified']:%Y-%m-%d})")
+
+        report = collect_garbage(
+            prefixes=options['prefixes'],
+            min_age_hours=options['min_age'],
+            dry_run=dry_run,
+            on_orphan=on_orphan,
+        )
+
+        if report.unmapped:
+            self.stderr.write(self.style.ERROR(
+                f"{len(report.unmapped)} référence(s) sans clé R2 reconnue : aucune suppression."
+            ))
+            for url in report.unmapped[:50]:
+                self.stderr.write(f"  {url}")
+            dry_run = True
+
+        self.stdout.write(f"Objets parcourus : {report.scanned} ({filesizeformat(report.scanned_bytes)})")
+        self.stdout.write(f"Récents ignorés : {report.recent}")
+        self.stdout.write(f"Orphelins : {report.orphans} ({filesizeformat(report.orphan_bytes)})")
+        if dry_run:
+            self.stdout.write(f"Uploads multipart à abandonner : {report.aborted_uploads}")
+            self.stdout.write(self.style.WARNING("Simulation : rien n'a été supprimé."))
+            return
+
+        self.stdout.write(f"Uploads multipart abandonnés : {report.aborted_uploads}")
+        for error in report.errors:
+            self.stderr.write(f"  {error}")
+        style = self.style.ERROR if report.errors else self.style.SUCCESS
+        self.stdout.write(style(f"{report.deleted} objet(s) supprimé(s), {len(report.errors)} erreur(s)."))
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Met en file l'analyse (durée, résolution, codecs, débit) des vidéos qui
+n'ont pas encore été analysées, ou de toutes avec --all.
+
+    python manage.py probe_videos [--all]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.jobs import enqueue
+from core.models import Video
+
+
+class Command(BaseCommand):
+    help = "Ajoute une tâche media.probe par vidéo à analyser."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Réanalyse aussi les vidéos déjà analysées.")
+
+    def handle(self, *args, **options):
+        videos = Video.objects.exclude(video_file__isnull=True).exclude(video_file='')
+        if not options['all']:
+            videos = videos.filter(probed_at__isnull=True)
+
+        total = 0
+        with transaction.atomic():
+            for pk in videos.values_list('pk', flat=True).iterator():
+                enqueue('media.probe', pk=pk)
+                total += 1
+        self.stdout.write(self.style.SUCCESS(f"{total} vidéo(s) en file d'analyse."))
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Recalcule like_count / comment_count de Video et Photo à partir des tables
+VideoLike / PhotoLike / VideoComment / PhotoComment. Une requête UPDATE par compteur, uniquement sur les lignes
+qui ont dérivé.
+
+    python manage.py reconcile_counters [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from core.models import Photo, PhotoComment, PhotoLike, Video, VideoComment, VideoLike
+
+
+def counted(related_model, fk):
+    """Sous-requête : nombre de lignes de related_model pointant vers l'objet courant."""
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(**{fk: OuterRef('pk')})
+            .order_by()
+            .values(fk)
+            .annotate(total=Count('*'))  # COUNT(*) : lecture de l'index seul
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+class Command(BaseCommand):
+    help = "Réconcilie les compteurs dénormalisés like_count / comment_count."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Affiche les dérives sans corriger.")
+
+    def handle(self, *args, **options):
+        targets = [
+            (Video, 'like_count', VideoLike, 'video'),
+            (Video, 'comment_count', VideoComment, 'video'),
+            (Photo, 'like_count', PhotoLike, 'photo'),
+            (Photo, 'comment_count', PhotoComment, 'photo'),
+        ]
+        with transaction.atomic():
+            for model, field, related_model, fk in targets:
+                expected = counted(related_model, fk)
+                drifted = model.objects.annotate(expected=expected).exclude(**{field: F('expected')})
+                if options['dry_run']:
+                    updated = drifted.count()
+                else:
+                    updated = model.objects.filter(pk__in=drifted.values('pk')).update(**{field: expected})
+                self.stdout.write(f"{model.__name__}.{field}: {updated} ligne(s) à corriger")
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS("Compteurs réconciliés."))
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Worker de la file de tâches de fond (core.jobs).
+
+    python manage.py run_jobs [--concurrency 4] [--poll-interval 1] [--once]
+    python manage.py run_jobs --stats
+"""
+import signal
+
+from django.core.management.base import BaseCommand
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = "Exécute les tâches de fond en attente (miniatures, suppressions R2, ...)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help="Tâches exécutées en parallèle.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Attente (s) quand la file est vide.")
+        parser.add_argument('--once', action='store_true', help="S'arrête quand il n'y a plus de tâche prête.")
+        parser.add_argument('--stats', action='store_true', help="Affiche le nombre de tâches par statut.")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for status, total in sorted(jobs.stats().items()):
+                self.stdout.write(f"{status}: {total}")
+            return
+
+        worker = jobs.Worker(
+            concurrency=max(options['concurrency'], 1),
+            poll_interval=options['poll_interval'],
+        )
+        # Arrêt propre : les tâches en cours se terminent
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+        signal.signal(signal.SIGINT, lambda *_: worker.stop())
+
+        self.stdout.write(f"Worker {worker.worker_id} démarré ({worker.concurrency} threads).")
+        worker.run(once=options['once'])
+        self.stdout.write("Worker arrêté.")
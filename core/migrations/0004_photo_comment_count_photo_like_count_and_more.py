@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:09
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Video = apps.get_model('core', 'Video')
+    Photo = apps.get_model('core', 'Photo')
+    Like = apps.get_model('core', 'Like')
+    Comment = apps.get_model('core', 'Comment')
+
+    def counted(related_model, fk):
+        return Coalesce(
+            Subquery(
+                related_model.objects.filter(**{fk: OuterRef('pk')})
+                .order_by()
+                .values(fk)
+                .annotate(total=Count('pk'))
+                .values('total'),
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        )
+
+    Video.objects.update(like_count=counted(Like, 'video'), comment_count=counted(Comment, 'video'))
+    Photo.objects.update(like_count=counted(Like, 'photo'), comment_count=counted(Comment, 'photo'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_comment_options_alter_photo_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
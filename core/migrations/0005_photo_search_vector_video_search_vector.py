@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:11
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+# Index GIN et remplissage initial : PostgreSQL uniquement (SQLite en dev
+# utilise la recherche icontains de core.search).
+TABLES = ('core_video', 'core_photo')
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        schema_editor.execute(
+            f"""
+            UPDATE {table} AS t SET search_vector =
+                setweight(to_tsvector(%s::regconfig, coalesce(t.title, '')), 'A')
+                || setweight(to_tsvector(%s::regconfig, coalesce(t.description, '')), 'B')
+                || setweight(to_tsvector(%s::regconfig, coalesce(
+                    (SELECT c.name FROM core_category AS c WHERE c.id = t.category_id), '')), 'C')
+            """,
+            [settings.SEARCH_CONFIG] * 3,
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_search_vector_gin ON {table} USING gin (search_vector)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {table}_search_vector_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_photo_comment_count_photo_like_count_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
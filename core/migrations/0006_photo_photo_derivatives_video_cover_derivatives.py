@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_photo_search_vector_video_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='photo_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='cover_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_video_probe_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='hls_manifest',
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.CreateModel(
+            name='Rendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=20)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField()),
+                ('bandwidth', models.PositiveIntegerField()),
+                ('playlist', models.CharField(blank=True, max_length=500)),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('processing', 'En cours'), ('ready', 'Prête'), ('failed', 'Échouée')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='core.video')),
+            ],
+            options={
+                'ordering': ['-height'],
+                'constraints': [models.UniqueConstraint(fields=('video', 'name'), name='core_rendition_video_name_uniq')],
+            },
+        ),
+    ]
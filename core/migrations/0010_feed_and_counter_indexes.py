@@ -0,0 +1,108 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently as PostgresAddIndexConcurrently
+from django.db import migrations, models
+
+
+class AddIndexConcurrently(PostgresAddIndexConcurrently):
+    """CREATE INDEX CONCURRENTLY sur PostgreSQL (tables en service), index ordinaire ailleurs."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY est interdit dans une transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0009_video_hls_renditions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Nouveaux index d'abord, pour ne jamais laisser ces requêtes sans index
+        AddIndexConcurrently(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('video__isnull', False)), fields=['video', '-created_at'], name='core_comment_video_recent_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('photo__isnull', False)), fields=['photo', '-created_at'], name='core_comment_photo_recent_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='like',
+            index=models.Index(condition=models.Q(('video__isnull', False)), fields=['video'], name='core_like_video_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='like',
+            index=models.Index(condition=models.Q(('photo__isnull', False)), fields=['photo'], name='core_like_photo_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='photo',
+            index=models.Index(fields=['-created_at', '-id'], name='core_photo_feed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='photo',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='core_photo_user_feed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='video',
+            index=models.Index(fields=['-created_at', '-id'], name='core_video_feed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='video',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='core_video_user_feed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='video',
+            index=models.Index(fields=['category', '-created_at'], name='core_video_category_feed_idx'),
+        ),
+        # Index de clé étrangère devenus redondants (préfixes des index ci-dessus)
+        migrations.AlterField(
+            model_name='comment',
+            name='photo',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.photo'),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='video',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.video'),
+        ),
+        migrations.AlterField(
+            model_name='like',
+            name='photo',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.photo'),
+        ),
+        migrations.AlterField(
+            model_name='like',
+            name='video',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.video'),
+        ),
+        migrations.AlterField(
+            model_name='photo',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='photos', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='category',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.category'),
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='videos', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:35
+
+from django.db import migrations
+
+from core import backfill
+
+
+# Copie par lots, une transaction par lot (cf. core.backfill) : la migration
+# elle-même ne doit pas tout envelopper dans une seule transaction.
+def copy_interactions(apps, schema_editor):
+    backfill.copy_rows(apps, schema_editor.connection)
+    backfill.reserve_ids(apps, schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0011_split_likes_comments'),
+    ]
+
+    operations = [
+        # Retour arrière : les anciennes tables sont intactes
+        migrations.RunPython(copy_interactions, migrations.RunPython.noop),
+    ]
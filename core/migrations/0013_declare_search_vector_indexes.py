@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:44
+
+import core.models
+from django.conf import settings
+from django.db import migrations
+
+INDEXES = {
+    'photo': 'core_photo_search_vector_gin',
+    'video': 'core_video_search_vector_gin',
+}
+
+
+# Sur PostgreSQL, les index GIN existent déjà sous ces noms (SQL brut de
+# 0005) : seul l'état des modèles change. Ailleurs, on les crée.
+def add_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    for model_name, index_name in INDEXES.items():
+        model = apps.get_model('core', model_name)
+        index = next(index for index in model._meta.indexes if index.name == index_name)
+        schema_editor.add_index(model, index)
+
+
+def remove_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    for model_name, index_name in INDEXES.items():
+        model = apps.get_model('core', model_name)
+        index = next(index for index in model._meta.indexes if index.name == index_name)
+        schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_copy_likes_comments'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='photo',
+                    index=core.models.SearchVectorIndex(fields=['search_vector'], name='core_photo_search_vector_gin'),
+                ),
+                migrations.AddIndex(
+                    model_name='video',
+                    index=core.models.SearchVectorIndex(fields=['search_vector'], name='core_video_search_vector_gin'),
+                ),
+            ],
+        ),
+        migrations.RunPython(add_indexes, remove_indexes),
+    ]
@@ -1,6 +1,10 @@
 # models.py
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from .view_counter import pending_views
 
 User = get_user_model()
 
@@ -16,10 +20,53 @@ class Category(models.Model):
         return self.name
 
 
-class Video(models.Model):
+class SearchVectorIndex(GinIndex):
+    """Index GIN du search_vector (core.search) ; index ordinaire hors PostgreSQL (SQLite en dev)."""
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return models.Index.create_sql(self, model, schema_editor, **kwargs)
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+
+class MediaQuerySet(models.QuerySet):
+    """Requêtes standard pour les listes de vidéos / photos."""
+
+    def for_feed(self):
+        # Relations affichées sur les cartes chargées en une seule requête ;
+        # le tsvector de recherche n'est jamais utile à l'affichage.
+        return self.select_related('user', 'category').defer('search_vector')
+
+
+class CommentQuerySet(models.QuerySet):
+    def for_display(self):
+        return self.select_related('user').order_by('-created_at')
+
+
+class CounterFieldsMixin:
+    """
+    save() d'un objet existant n'écrit pas les compteurs (COUNTER_FIELDS).
+
+    Ils ne changent que par UPDATE ... F() (core.signals, core.view_counter,
+    reconcile_counters) : une instance chargée avant un like ou une vue
+    réécrirait sinon l'ancienne valeur.
+    """
+    COUNTER_FIELDS = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+class Video(CounterFieldsMixin, models.Model):
     # 🔴 AJOUT: user - seul le propriétaire peut modifier/supprimer
     # ✅ TEMPORAIRE: null=True, blank=True pour la migration
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='videos', null=True, blank=True)
+    # Index couvert par core_video_user_feed_idx (user, -created_at, -id)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='videos', null=True, blank=True, db_index=False)
     
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -27,18 +74,50 @@ class Video(models.Model):
     # ✅ CHANGEMENT: CharField pour les URLs R2
     video_file = models.CharField(max_length=500, blank=True, null=True)  # URL R2 complète
     cover_image = models.CharField(max_length=500, blank=True, null=True)  # URL R2 complète
+    # Déclinaisons redimensionnées de la couverture (core.thumbnails)
+    cover_derivatives = models.JSONField(default=dict, blank=True, editable=False)
 
     # Metadata
     duration = models.PositiveIntegerField(default=0)  # en secondes
-    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, db_index=False)
     views = models.PositiveIntegerField(default=0)
 
+    # Lus dans les en-têtes du fichier sur R2 (core.probe, tâche media.probe)
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    video_codec = models.CharField(max_length=32, blank=True, editable=False)
+    audio_codec = models.CharField(max_length=32, blank=True, editable=False)
+    bitrate = models.PositiveIntegerField(null=True, blank=True, editable=False)  # bits/s
+    probed_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Playlist HLS maîtresse (core.hls) ; vide tant que le packaging n'est pas prêt
+    hls_manifest = models.CharField(max_length=500, blank=True, editable=False)
+
+    # Compteurs dénormalisés (maintenus par core.signals, réconciliés par reconcile_counters)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    # Document plein texte (titre, description, catégorie) maintenu par core.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = MediaQuerySet.as_manager()
+
+    COUNTER_FIELDS = ('views', 'like_count', 'comment_count')
+
     class Meta:
         ordering = ['-created_at']
+        # Ordre des flux (core.pagination.keyset_page) : pas de tri en mémoire
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='core_video_feed_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='core_video_user_feed_idx'),
+            # Vidéos similaires (video_player)
+            models.Index(fields=['category', '-created_at'], name='core_video_category_feed_idx'),
+            SearchVectorIndex(fields=['search_vector'], name='core_video_search_vector_gin'),
+        ]
 
     def __str__(self):
         return self.title
@@ -53,26 +132,83 @@ class Video(models.Model):
         """Retourne l'URL complète de l'image de couverture"""
         return self.cover_image if self.cover_image else ""
 
+    @property
+    def approximate_views(self):
+        """Vues en base + vues encore dans le buffer de ce processus"""
+        return self.views + pending_views(self.id)
+
+
+class Rendition(models.Model):
+    """Une qualité du packaging HLS d'une vidéo (cf. core.hls)."""
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'En attente'),
+        (PROCESSING, 'En cours'),
+        (READY, 'Prête'),
+        (FAILED, 'Échouée'),
+    ]
+
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='renditions')
+    name = models.CharField(max_length=20)  # ex. « 720p »
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField()
+    bandwidth = models.PositiveIntegerField()  # bits/s annoncés dans la playlist maîtresse
+    playlist = models.CharField(max_length=500, blank=True)  # URL R2 de la playlist de la qualité
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-height']
+        constraints = [
+            models.UniqueConstraint(fields=['video', 'name'], name='core_rendition_video_name_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.video} - {self.name}"
 
-class Photo(models.Model):
+
+class Photo(CounterFieldsMixin, models.Model):
     # 🔴 AJOUT: user - seul le propriétaire peut modifier/supprimer
     # ✅ TEMPORAIRE: null=True, blank=True pour la migration
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='photos', null=True, blank=True)
+    # Index couvert par core_photo_user_feed_idx (user, -created_at, -id)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='photos', null=True, blank=True, db_index=False)
     
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
 
     # ✅ CHANGEMENT: CharField pour l'URL R2
     photo_file = models.CharField(max_length=500, blank=True, null=True)  # URL R2 complète
+    # Déclinaisons redimensionnées de la photo (core.thumbnails)
+    photo_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+
+    # Compteurs dénormalisés (maintenus par core.signals, réconciliés par reconcile_counters)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    # Document plein texte (titre, description, catégorie) maintenu par core.search
+    search_vector = SearchVectorField(null=True, editable=False)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = MediaQuerySet.as_manager()
+
+    COUNTER_FIELDS = ('like_count', 'comment_count')
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='core_photo_feed_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='core_photo_user_feed_idx'),
+            SearchVectorIndex(fields=['search_vector'], name='core_photo_search_vector_gin'),
+        ]
 
     def __str__(self):
         return self.title
@@ -95,10 +231,15 @@ class SliderItem(models.Model):
         return f"Slider: {self.video.title}"
 
 
+# Anciennes tables Like / Comment (vidéo OU photo, l'autre clé à NULL).
+# Plus écrites par l'application : recopiées dans VideoLike / PhotoLike /
+# VideoComment / PhotoComment (core.backfill, migration 0012), elles seront
+# supprimées à la version suivante.
 class Like(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    video = models.ForeignKey(Video, on_delete=models.CASCADE, null=True, blank=True)
-    photo = models.ForeignKey(Photo, on_delete=models.CASCADE, null=True, blank=True)
+    # Index partiels ci-dessous à la place des index de clé étrangère
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, null=True, blank=True, db_index=False)
+    photo = models.ForeignKey(Photo, on_delete=models.CASCADE, null=True, blank=True, db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -106,6 +247,12 @@ class Like(models.Model):
             ("user", "video"),
             ("user", "photo")
         ]
+        # Chaque like ne vise qu'un des deux : les index partiels ignorent
+        # l'autre moitié de la table (comptages, suppressions en cascade)
+        indexes = [
+            models.Index(fields=['video'], condition=models.Q(video__isnull=False), name='core_like_video_idx'),
+            models.Index(fields=['photo'], condition=models.Q(photo__isnull=False), name='core_like_photo_idx'),
+        ]
 
     def __str__(self):
         if self.video:
@@ -115,18 +262,105 @@ class Like(models.Model):
 
 class Comment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    video = models.ForeignKey(Video, on_delete=models.CASCADE, null=True, blank=True)
-    photo = models.ForeignKey(Photo, on_delete=models.CASCADE, null=True, blank=True)
+    # Index partiels ci-dessous à la place des index de clé étrangère
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, null=True, blank=True, db_index=False)
+    photo = models.ForeignKey(Photo, on_delete=models.CASCADE, null=True, blank=True, db_index=False)
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-created_at']
+        # Fil de commentaires d'un contenu, le plus récent d'abord (for_display)
+        indexes = [
+            models.Index(
+                fields=['video', '-created_at'], condition=models.Q(video__isnull=False),
+                name='core_comment_video_recent_idx',
+            ),
+            models.Index(
+                fields=['photo', '-created_at'], condition=models.Q(photo__isnull=False),
+                name='core_comment_photo_recent_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Comment by {self.user}"
+
+
+# Likes et commentaires, une table par type de contenu : pas de clé
+# étrangère à NULL, des index denses (cf. Like / Comment ci-dessus)
+class BaseLike(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        abstract = True
+
+
+class VideoLike(BaseLike):
+    # Index couvert par la contrainte unique (video, user)
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='likes', db_index=False)
+
+    class Meta:
+        # Sert aussi les comptages par vidéo et le « déjà aimé ? »
+        constraints = [
+            models.UniqueConstraint(fields=['video', 'user'], name='core_videolike_video_user_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} likes video: {self.video}"
+
+
+class PhotoLike(BaseLike):
+    # Index couvert par la contrainte unique (photo, user)
+    photo = models.ForeignKey(Photo, on_delete=models.CASCADE, related_name='likes', db_index=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['photo', 'user'], name='core_photolike_photo_user_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} likes photo: {self.photo}"
+
+
+class BaseComment(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
+        abstract = True
         ordering = ['-created_at']
 
     def __str__(self):
         return f"Comment by {self.user}"
 
 
+class VideoComment(BaseComment):
+    # Index couvert par core_videocomment_recent_idx
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='comments', db_index=False)
+
+    class Meta(BaseComment.Meta):
+        # Fil de commentaires, le plus récent d'abord (for_display)
+        indexes = [
+            models.Index(fields=['video', '-created_at'], name='core_videocomment_recent_idx'),
+        ]
+
+
+class PhotoComment(BaseComment):
+    # Index couvert par core_photocomment_recent_idx
+    photo = models.ForeignKey(Photo, on_delete=models.CASCADE, related_name='comments', db_index=False)
+
+    class Meta(BaseComment.Meta):
+        indexes = [
+            models.Index(fields=['photo', '-created_at'], name='core_photocomment_recent_idx'),
+        ]
+
+
 class SubscriptionPlan(models.Model):
     name = models.CharField(max_length=100)
     price = models.PositiveIntegerField()  # FCFA
@@ -167,4 +401,38 @@ class Complaint(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return self.subject
\ No newline at end of file
+        return self.subject
+
+class Job(models.Model):
+    """Tâche de fond exécutée par la commande run_jobs (cf. core.jobs)."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'En attente'),
+        (RUNNING, 'En cours'),
+        (SUCCEEDED, 'Terminée'),
+        (FAILED, 'Échouée'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='core_job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
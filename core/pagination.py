@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Pagination par curseur (keyset) sur (-created_at, -id).
+
+Contrairement à OFFSET, chaque page est une simple requête
+« WHERE created_at <= c AND (created_at < c OR (created_at = c AND id < i))
+ORDER BY created_at DESC, id DESC LIMIT n », équivalente à
+(created_at, id) < (c, i) : la borne created_at <= c, redondante, permet à
+PostgreSQL de démarrer le parcours de l'index (created_at, id) au curseur
+(un OR seul ne lui sert pas de borne). Une page profonde coûte autant que la
+première.
+"""
+import base64
+from dataclasses import dataclass
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    next_cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(obj):
+    raw = f"{obj.created_at.isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Renvoie (created_at, pk) ou None si le curseur est absent ou invalide."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            return None
+        return created_at, int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return default
+
+
+def after_cursor(queryset, cursor=None):
+    """`queryset` trié par (-created_at, -id), limité aux éléments après `cursor`."""
+    queryset = queryset.order_by('-created_at', '-pk')
+    position = decode_cursor(cursor)
+    if position:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk),
+            created_at__lte=created_at,
+        )
+    return queryset
+
+
+def keyset_page(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """Renvoie la page qui suit `cursor` (ou la première page) de `queryset`."""
+    # Un élément de plus pour savoir s'il existe une page suivante
+    items = list(after_cursor(queryset, cursor)[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(items[-1])
+    return KeysetPage(items=items, next_cursor=next_cursor)
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+Lecture des métadonnées d'une vidéo (durée, résolution, codecs, débit)
+directement depuis R2, sans télécharger le fichier.
+
+Seuls les en-têtes du conteneur sont lus, par requêtes GET avec Range par
+blocs de PROBE_CHUNK_SIZE octets :
+
+- MP4 / MOV (ISO BMFF) : on saute de boîte en boîte au premier niveau
+  jusqu'à « moov » (au début ou à la fin du fichier), qu'on lit seule ;
+- Matroska / WebM : on parcourt les enfants du Segment jusqu'à Info et
+  Tracks, en sautant les Clusters sans les lire.
+
+Au total quelques dizaines de Ko par vidéo ; au-delà de PROBE_MAX_BYTES lus,
+on abandonne (fichier corrompu ou inhabituel).
+"""
+import struct
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from .storage import get_s3_client
+
+
+class ProbeError(Exception):
+    """Conteneur non reconnu ou illisible : inutile de réessayer."""
+
+
+@dataclass
+class MediaInfo:
+    duration: float = None      # secondes
+    width: int = None
+    height: int = None
+    video_codec: str = ''
+    audio_codec: str = ''
+    bitrate: int = None         # bits/s, moyenne sur tout le fichier
+    size: int = None            # octets
+
+
+class RangeReader:
+    """Lecture aléatoire d'un objet R2 par blocs, avec un budget d'octets."""
+
+    def __init__(self, key, client=None):
+        self.key = key
+        self.client = client or get_s3_client()
+        self.chunk_size = settings.PROBE_CHUNK_SIZE
+        self.size = None
+        self.bytes_read = 0
+        self._blocks = {}
+
+    def _fetch(self, index):
+        start = index * self.chunk_size
+        end = start + self.chunk_size - 1
+        if self.size is not None:
+            end = min(end, self.size - 1)
+        if self.bytes_read + (end - start + 1) > settings.PROBE_MAX_BYTES:
+            raise ProbeError(f"{self.key} : plus de {settings.PROBE_MAX_BYTES} octets lus")
+        response = self.client.get_object(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=self.key, Range=f"bytes={start}-{end}",
+        )
+        data = response['Body'].read()
+        self.bytes_read += len(data)
+        if self.size is None:
+            # « bytes 0-65535/123456789 »
+            content_range = response.get('ContentRange') or ''
+            self.size = int(content_range.rsplit('/', 1)[-1]) if '/' in content_range else len(data)
+        self._blocks[index] = data
+        return data
+
+    def read(self, offset, length):
+        """Jusqu'à `length` octets à partir de `offset` (moins en fin de fichier)."""
+        if self.size is not None:
+            length = max(0, min(length, self.size - offset))
+        parts = []
+        while length > 0:
+            index, skip = divmod(offset, self.chunk_size)
+            block = self._blocks.get(index)
+            if block is None:
+                block = self._fetch(index)
+            part = block[skip:skip + length]
+            if not part:
+                break
+            parts.append(part)
+            offset += len(part)
+            length -= len(part)
+        return b''.join(parts)
+
+
+# ------------------------
+# MP4 / MOV (ISO BMFF)
+# ------------------------
+
+def _iter_boxes(data, start=0, end=None):
+    """(type, début du contenu, fin) des boîtes contenues dans data[start:end]."""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            break
+        yield box_type.decode('latin-1'), offset + header, min(offset + size, end)
+        offset += size
+
+
+def _find_box(data, path, start=0, end=None):
+    for box_type, body, box_end in _iter_boxes(data, start, end):
+        if box_type == path[0]:
+            return (body, box_end) if len(path) == 1 else _find_box(data, path[1:], body, box_end)
+    return None
+
+
+def _parse_moov(moov, info):
+    timescale = None
+    mvhd = _find_box(moov, ['mvhd'])
+    if mvhd:
+        body = mvhd[0]
+        if moov[body] == 1:
+            timescale, duration = struct.unpack_from('>IQ', moov, body + 20)
+        else:
+            timescale, duration = struct.unpack_from('>II', moov, body + 12)
+        if timescale and duration:
+            info.duration = duration / timescale
+
+    # MP4 fragmenté : durée totale dans mvex/mehd
+    mehd = _find_box(moov, ['mvex', 'mehd'])
+    if mehd and timescale and not info.duration:
+        body = mehd[0]
+        fmt = '>Q' if moov[body] == 1 else '>I'
+        info.duration = struct.unpack_from(fmt, moov, body + 4)[0] / timescale or None
+
+    for box_type, body, box_end in _iter_boxes(moov):
+        if box_type != 'trak':
+            continue
+        hdlr = _find_box(moov, ['mdia', 'hdlr'], body, box_end)
+        stsd = _find_box(moov, ['mdia', 'minf', 'stbl', 'stsd'], body, box_end)
+        if not hdlr or not stsd:
+            continue
+        handler = moov[hdlr[0] + 8:hdlr[0] + 12]
+        # Première entrée de stsd : taille (4) puis format (avc1, hvc1, mp4a, ...)
+        codec = moov[stsd[0] + 12:stsd[0] + 16].decode('latin-1').strip()
+
+        if handler == b'vide' and not info.video_codec:
+            info.video_codec = codec
+            tkhd = _find_box(moov, ['tkhd'], body, box_end)
+            if tkhd:
+                offset = tkhd[0] + (88 if moov[tkhd[0]] == 1 else 76)
+                width, height = struct.unpack_from('>II', moov, offset)
+                info.width, info.height = width >> 16, height >> 16
+            if not info.width:
+                # Dimensions codées de l'entrée visuelle de stsd
+                info.width, info.height = struct.unpack_from('>HH', moov, stsd[0] + 8 + 8 + 24)
+        elif handler == b'soun' and not info.audio_codec:
+            info.audio_codec = codec
+
+
+def _probe_mp4(reader, info):
+    offset = 0
+    while True:
+        header = reader.read(offset, 16)
+        if len(header) < 8:
+            raise ProbeError(f"{reader.key} : boîte moov introuvable")
+        size, box_type = struct.unpack_from('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = reader.size - offset
+        if size < header_size:
+            raise ProbeError(f"{reader.key} : boîte {box_type!r} invalide")
+        if box_type == b'moov':
+            if size > settings.PROBE_MAX_BYTES:
+                raise ProbeError(f"{reader.key} : boîte moov de {size} octets")
+            _parse_moov(reader.read(offset + header_size, size - header_size), info)
+            return
+        offset += size
+
+
+# ------------------------
+# Matroska / WebM (EBML)
+# ------------------------
+
+EBML_HEADER = 0x1A45DFA3
+SEGMENT = 0x18538067
+INFO = 0x1549A966
+TRACKS = 0x1654AE6B
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACK_ENTRY = 0xAE
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+
+UNKNOWN_SIZE = object()
+
+
+def _vint(data, offset, keep_marker):
+    """Entier de longueur variable EBML : (valeur, longueur)."""
+    first = data[offset]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8 or offset + length > len(data):
+        raise ProbeError("entier EBML invalide")
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in data[offset + 1:offset + length]:
+        value = (value << 8) | byte
+    return value, length
+
+
+def _element_header(data, offset):
+    """(id, taille du contenu, longueur de l'en-tête) de l'élément à `offset`."""
+    element_id, id_length = _vint(data, offset, keep_marker=True)
+    size, size_length = _vint(data, offset + id_length, keep_marker=False)
+    if size == (1 << (7 * size_length)) - 1:
+        size = UNKNOWN_SIZE
+    return element_id, size, id_length + size_length
+
+
+def _iter_elements(data, start=0, end=None):
+    end = len(data) if end is None else end
+    offset = start
+    while offset < end:
+        element_id, size, header = _element_header(data, offset)
+        body = offset + header
+        if size is UNKNOWN_SIZE:
+            size = end - body
+        yield element_id, body, min(body + size, end)
+        offset = body + size
+
+
+def _uint(data, start, end):
+    return int.from_bytes(data[start:end], 'big')
+
+
+def _parse_info(data, info):
+    scale, duration = 1_000_000, None
+    for element_id, start, end in _iter_elements(data):
+        if element_id == TIMECODE_SCALE:
+            scale = _uint(data, start, end)
+        elif element_id == DURATION:
+            duration = struct.unpack('>f' if end - start == 4 else '>d', data[start:end])[0]
+    if duration:
+        info.duration = duration * scale / 1e9
+
+
+def _parse_tracks(data, info):
+    for element_id, start, end in _iter_elements(data):
+        if element_id != TRACK_ENTRY:
+            continue
+        track_type, codec, width, height = None, '', None, None
+        for child_id, child_start, child_end in _iter_elements(data, start, end):
+            if child_id == TRACK_TYPE:
+                track_type = _uint(data, child_start, child_end)
+            elif child_id == CODEC_ID:
+                codec = data[child_start:child_end].decode('ascii', 'replace').rstrip('\x00')
+            elif child_id == VIDEO:
+                for video_id, video_start, video_end in _iter_elements(data, child_start, child_end):
+                    if video_id == PIXEL_WIDTH:
+                        width = _uint(data, video_start, video_end)
+                    elif video_id == PIXEL_HEIGHT:
+                        height = _uint(data, video_start, video_end)
+        if track_type == 1 and not info.video_codec:
+            info.video_codec, info.width, info.height = codec, width, height
+        elif track_type == 2 and not info.audio_codec:
+            info.audio_codec = codec
+
+
+def _probe_matroska(reader, info):
+    data = reader.read(0, 64)
+    _, size, header = _element_header(data, 0)
+    offset = header + size
+    element_id, size, header = _element_header(reader.read(offset, 16), 0)
+    if element_id != SEGMENT:
+        raise ProbeError(f"{reader.key} : segment Matroska introuvable")
+    offset += header
+    segment_end = reader.size if size is UNKNOWN_SIZE else min(offset + size, reader.size)
+
+    found = set()
+    while offset < segment_end and found != {INFO, TRACKS}:
+        element_id, size, header = _element_header(reader.read(offset, 16), 0)
+        if size is UNKNOWN_SIZE:
+            # Cluster de taille inconnue (flux en direct) : impossible de le sauter
+            break
+        if element_id in (INFO, TRACKS):
+            body = reader.read(offset + header, size)
+            (_parse_info if element_id == INFO else _parse_tracks)(body, info)
+            found.add(element_id)
+        offset += header + size
+
+
+def probe(key, client=None):
+    """Métadonnées de l'objet R2 `key` ; lève ProbeError si le format n'est pas reconnu."""
+    reader = RangeReader(key, client)
+    head = reader.read(0, 12)
+    info = MediaInfo()
+    try:
+        if head[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'wide', b'skip'):
+            _probe_mp4(reader, info)
+        elif head[:4] == EBML_HEADER.to_bytes(4, 'big'):
+            _probe_matroska(reader, info)
+        else:
+            raise ProbeError(f"{key} : format de conteneur inconnu")
+    except (struct.error, IndexError) as exc:
+        raise ProbeError(f"{key} : en-têtes illisibles ({exc})") from exc
+
+    info.size = reader.size
+    if info.duration and reader.size:
+        info.bitrate = int(reader.size * 8 / info.duration)
+    return info
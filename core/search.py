@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Recherche plein texte sur les vidéos et les photos.
+
+Sur PostgreSQL, chaque Video / Photo porte un tsvector (search_vector) indexé
+en GIN, calculé à partir du titre (poids A), de la description (B) et du nom
+de la catégorie (C). Il est recalculé à chaque enregistrement (core.signals)
+et les résultats sont triés par pertinence (ts_rank).
+
+Sur les autres bases (SQLite en développement), on retombe sur un
+icontains sur les mêmes champs, trié par date.
+"""
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, Q, TextField, Value
+
+from .models import Photo, Video
+
+
+def is_full_text_available():
+    return connection.vendor == 'postgresql'
+
+
+def _document(instance):
+    category_name = instance.category.name if instance.category_id else ''
+    config = settings.SEARCH_CONFIG
+    return (
+        SearchVector(Value(instance.title, output_field=TextField()), weight='A', config=config)
+        + SearchVector(Value(instance.description or '', output_field=TextField()), weight='B', config=config)
+        + SearchVector(Value(category_name, output_field=TextField()), weight='C', config=config)
+    )
+
+
+def update_search_vector(instance):
+    """Recalcule le search_vector d'une vidéo ou d'une photo (sans déclencher save())."""
+    if not is_full_text_available():
+        return
+    type(instance).objects.filter(pk=instance.pk).update(search_vector=_document(instance))
+
+
+def update_search_vectors(instances):
+    """
+    Variante groupée de update_search_vector pour des objets d'un même modèle
+    (créés par bulk_create) : une requête UPDATE par catégorie distincte.
+    """
+    if not is_full_text_available() or not instances:
+        return
+    model = type(instances[0])
+    by_category = {}
+    for instance in instances:
+        category_name = instance.category.name if instance.category_id else ''
+        by_category.setdefault(category_name, []).append(instance.pk)
+    for category_name, pks in by_category.items():
+        model.objects.filter(pk__in=pks).update(search_vector=_column_document(category_name))
+
+
+def _column_document(category_name):
+    """Document calculé en SQL à partir des colonnes, pour un UPDATE groupé."""
+    config = settings.SEARCH_CONFIG
+    return (
+        SearchVector('title', weight='A', config=config)
+        + SearchVector('description', weight='B', config=config)
+        + SearchVector(Value(category_name, output_field=TextField()), weight='C', config=config)
+    )
+
+
+def update_category_search_vectors(category):
+    """Un renommage de catégorie change le document de tous ses contenus : un UPDATE par modèle."""
+    if not is_full_text_available():
+        return
+    for model in (Video, Photo):
+        model.objects.filter(category=category).update(search_vector=_column_document(category.name))
+
+
+def search(queryset, query):
+    """Filtre `queryset` (Video ou Photo) sur `query`, trié par pertinence."""
+    if is_full_text_available():
+        search_query = SearchQuery(query, search_type='websearch', config=settings.SEARCH_CONFIG)
+        return (
+            queryset.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F('search_vector'), search_query))
+            .order_by('-rank', '-created_at')
+        )
+
+    return queryset.filter(
+        Q(title__icontains=query)
+        | Q(description__icontains=query)
+        | Q(category__name__icontains=query)
+    ).order_by('-created_at')
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Maintenance des données dénormalisées de Video et Photo.
+
+Compteurs like_count / comment_count :
+
+Chaque création ou suppression d'un like ou d'un commentaire (VideoLike,
+PhotoLike, VideoComment, PhotoComment) applique un UPDATE atomique
+(F() + 1 / F() - 1) sur la vidéo ou la photo ciblée, dans la même
+transaction que l'écriture du like / commentaire. Les dérives éventuelles
+(suppressions en masse via QuerySet.update, données historiques) sont
+corrigées par la commande reconcile_counters.
+
+Index de recherche : search_vector est recalculé après chaque
+enregistrement d'une vidéo, d'une photo ou d'une catégorie (core.search),
+et l'index de suggestions du processus (core.suggest) est mis à jour.
+
+QuerySet.bulk_create n'envoie pas post_save : les créations groupées de
+vidéos / photos appellent content_bulk_created(), qui fait le même travail
+en quelques requêtes.
+
+Page d'accueil : l'instantané en cache (core.homepage) est invalidé quand
+une vidéo, une photo ou un élément du slider est créé, modifié ou supprimé.
+
+Abonnements : toute modification d'un UserSubscription ou d'un Payment
+invalide les droits en cache de l'utilisateur (core.entitlements).
+
+Ces invalidations attendent la validation de la transaction
+(transaction.on_commit) : invalidé plus tôt, le cache pourrait être
+recalculé par une autre requête à partir des données d'avant l'écriture.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import entitlements, homepage, search, suggest
+from .models import (
+    Category, Payment, Photo, PhotoComment, PhotoLike, SliderItem, UserSubscription, Video, VideoComment,
+    VideoLike,
+)
+
+
+def _adjust(instance, field, delta):
+    if delta > 0:
+        value = F(field) + delta
+    else:
+        # Jamais en dessous de zéro (champ PositiveIntegerField)
+        value = Greatest(F(field) + delta, 0)
+    if isinstance(instance, (VideoLike, VideoComment)):
+        Video.objects.filter(id=instance.video_id).update(**{field: value})
+    else:
+        Photo.objects.filter(id=instance.photo_id).update(**{field: value})
+
+
+@receiver(post_save, sender=VideoLike)
+@receiver(post_save, sender=PhotoLike)
+def like_created(sender, instance, created, **kwargs):
+    if created:
+        _adjust(instance, 'like_count', 1)
+
+
+@receiver(post_delete, sender=VideoLike)
+@receiver(post_delete, sender=PhotoLike)
+def like_deleted(sender, instance, **kwargs):
+    _adjust(instance, 'like_count', -1)
+
+
+@receiver(post_save, sender=VideoComment)
+@receiver(post_save, sender=PhotoComment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        _adjust(instance, 'comment_count', 1)
+
+
+@receiver(post_delete, sender=VideoComment)
+@receiver(post_delete, sender=PhotoComment)
+def comment_deleted(sender, instance, **kwargs):
+    _adjust(instance, 'comment_count', -1)
+
+
+@receiver(post_save, sender=Video)
+@receiver(post_save, sender=Photo)
+def content_saved(sender, instance, **kwargs):
+    search.update_search_vector(instance)
+    suggest.index_object(sender.__name__.lower(), instance.pk, instance.title)
+
+
+def content_bulk_created(sender, instances):
+    """Équivalent de content_saved + homepage_changed pour un bulk_create."""
+    search.update_search_vectors(instances)
+    kind = sender.__name__.lower()
+    for instance in instances:
+        suggest.index_object(kind, instance.pk, instance.title)
+    transaction.on_commit(homepage.invalidate)
+
+
+@receiver(post_delete, sender=Video)
+@receiver(post_delete, sender=Photo)
+def content_deleted(sender, instance, **kwargs):
+    suggest.unindex_object(sender.__name__.lower(), instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    if not created:
+        search.update_category_search_vectors(instance)
+    suggest.index_object('category', instance.pk, instance.name)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    suggest.unindex_object('category', instance.pk)
+
+
+@receiver(post_save, sender=UserSubscription)
+@receiver(post_delete, sender=UserSubscription)
+@receiver(post_save, sender=Payment)
+def subscription_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(entitlements.invalidate, instance.user_id))
+
+
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+@receiver(post_save, sender=Photo)
+@receiver(post_delete, sender=Photo)
+@receiver(post_save, sender=SliderItem)
+@receiver(post_delete, sender=SliderItem)
+def homepage_changed(sender, instance, **kwargs):
+    transaction.on_commit(homepage.invalidate)
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Accès à R2 (API S3) : clients partagés et upload en streaming.
+
+Un seul client boto3 (et un client dédié aux signatures) est créé par
+processus, à la première utilisation ; son pool de connexions TLS est
+réutilisé par toutes les requêtes du worker.
+
+Les fichiers reçus par Django sont envoyés morceau par morceau : la mémoire
+utilisée par un upload est bornée à (R2_MULTIPART_CONCURRENCY + 1) parts,
+quelle que soit la taille du fichier.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import boto3
+from botocore.config import Config
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _build_client(presign):
+    config = Config(
+        signature_version='s3v4',
+        s3={'addressing_style': 'path'},
+        max_pool_connections=settings.R2_MAX_POOL_CONNECTIONS,
+        tcp_keepalive=settings.R2_TCP_KEEPALIVE,
+        retries={
+            'max_attempts': settings.R2_MAX_ATTEMPTS,
+            'mode': settings.R2_RETRY_MODE,
+        },
+    )
+    if presign:
+        # Les signatures sont calculées localement : pas besoin de pool
+        config = config.merge(Config(max_pool_connections=1))
+    session = boto3.session.Session()
+    return session.client(
+        's3',
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name='auto',
+        config=config,
+    )
+
+
+def _get_client(name, presign=False):
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = _build_client(presign)
+    return client
+
+
+def get_s3_client():
+    """Client S3 partagé du processus (thread-safe) pour les opérations sur R2."""
+    return _get_client('default')
+
+
+def get_presign_client():
+    """Client S3 partagé du processus pour générer les URLs/POST présignés."""
+    return _get_client('presign', presign=True)
+
+
+def reset_clients():
+    """Oublie les clients créés (tests, changement de configuration)."""
+    with _clients_lock:
+        _clients.clear()
+
+# R2/S3 : toutes les parts (sauf la dernière) font au moins 5 Mo
+# et R2 exige qu'elles aient toutes la même taille.
+MIN_PART_SIZE = 5 * 1024 * 1024
+# Nombre maximum de parts d'un upload multipart
+MAX_PARTS = 10000
+
+
+def part_size_for(total_size=None):
+    """Taille de part à utiliser pour un fichier de `total_size` octets (si connu)."""
+    part_size = max(settings.R2_MULTIPART_PART_SIZE, MIN_PART_SIZE)
+    if total_size:
+        # Assez grande pour rester sous MAX_PARTS, arrondie au Mo supérieur
+        needed = -(-total_size // MAX_PARTS)
+        part_size = max(part_size, -(-needed // (1024 * 1024)) * 1024 * 1024)
+    return part_size
+
+
+def public_root():
+    """Racine des URLs publiques des objets R2 (domaine CDN, sinon endpoint/bucket)."""
+    cdn = (getattr(settings, 'R2_CDN_DOMAIN', '') or os.getenv('R2_CDN_DOMAIN', '')).strip()
+    if cdn and cdn.startswith("http"):
+        return cdn.rstrip('/')
+    if cdn:
+        return f"https://{cdn.rstrip('/')}"
+    return f"{settings.AWS_S3_ENDPOINT_URL.rstrip('/')}/{settings.AWS_STORAGE_BUCKET_NAME}"
+
+
+def public_url(key):
+    return f"{public_root()}/{key}"
+
+
+def key_from_url(url):
+    """Clé R2 d'une URL publique enregistrée en base (None si l'URL est externe)."""
+    if not url:
+        return None
+    root = public_root() + '/'
+    if url.startswith(root):
+        return url[len(root):]
+    # URLs construites avec MEDIA_URL (core.async_views)
+    media_url = getattr(settings, 'MEDIA_URL', '')
+    if media_url.startswith('http') and url.startswith(media_url):
+        return url[len(media_url):]
+    return None
+
+
+def _upload_part(s3_client, bucket, key, upload_id, part_number, body):
+    response = s3_client.upload_part(
+        Bucket=bucket,
+        Key=key,
+        UploadId=upload_id,
+        PartNumber=part_number,
+        Body=body,
+    )
+    return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+
+def _iter_parts(uploaded_file, part_size):
+    # UploadedFile.chunks() ignore chunk_size pour les fichiers en mémoire :
+    # on lit donc nous-mêmes des parts de taille fixe.
+    uploaded_file.seek(0)
+    while True:
+        data = uploaded_file.read(part_size)
+        if not data:
+            break
+        yield data
+
+
+def stream_upload(s3_client, uploaded_file, key, content_type=None, **extra_args):
+    """
+    Envoie un UploadedFile Django vers R2 sous `key` sans le lire en entier.
+
+    Les petits fichiers partent en un seul put_object ; au-delà d'une part,
+    on ouvre un upload multipart dont les parts sont envoyées en parallèle.
+    En cas d'erreur, l'upload multipart est annulé puis l'exception relancée.
+    """
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+    part_size = part_size_for(uploaded_file.size)
+    concurrency = max(settings.R2_MULTIPART_CONCURRENCY, 1)
+    content_type = content_type or 'application/octet-stream'
+
+    if uploaded_file.size is not None and uploaded_file.size <= part_size:
+        uploaded_file.seek(0)
+        s3_client.put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=uploaded_file.read(),
+            ContentType=content_type,
+            **extra_args
+        )
+        return key
+
+    upload_id = s3_client.create_multipart_upload(
+        Bucket=bucket,
+        Key=key,
+        ContentType=content_type,
+        **extra_args
+    )['UploadId']
+
+    parts = []
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='r2-part') as executor:
+            pending = set()
+            for part_number, chunk in enumerate(_iter_parts(uploaded_file, part_size), start=1):
+                # On attend qu'une part se libère avant de lire la suivante
+                if len(pending) >= concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    parts.extend(future.result() for future in done)
+                pending.add(executor.submit(
+                    _upload_part, s3_client, bucket, key, upload_id, part_number, chunk
+                ))
+            parts.extend(future.result() for future in wait(pending).done)
+
+        parts.sort(key=lambda part: part['PartNumber'])
+        s3_client.complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts},
+        )
+    except BaseException:
+        logger.warning("Échec de l'upload multipart %s, annulation.", key, exc_info=True)
+        try:
+            s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        except Exception:
+            logger.error("Impossible d'annuler l'upload multipart %s (%s)", key, upload_id, exc_info=True)
+        raise
+
+    return key
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Ramasse-miettes du bucket R2 : supprime les objets qu'aucune ligne ne
+référence plus (fichiers remplacés, contenus supprimés, uploads présignés
+jamais finalisés) et abandonne les uploads multipart inachevés.
+
+L'ensemble des clés référencées est construit en un seul passage sur
+Video / Photo (URLs, miniatures, préfixes HLS) ; le bucket est ensuite
+listé préfixe par préfixe (ListObjectsV2, 1000 clés par page) sans jamais
+tout charger en mémoire, et les orphelins sont supprimés par lots de 1000
+(DeleteObjects).
+
+Les objets plus récents que GC_MIN_AGE_HOURS sont ignorés : un upload
+présigné peut précéder de peu la création de la ligne qui le référence.
+
+Une référence est rattachée à une clé par son URL publique actuelle, sinon
+par son chemin (ancien domaine CDN, URL mal formée...) à partir du premier
+préfixe de GC_PREFIXES qu'il contient. Si une référence non vide ne peut
+être rattachée à aucune clé, rien n'est supprimé : elle est signalée dans
+le rapport.
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .hls import key_package_prefix
+from .models import Photo, Rendition, Video
+from .storage import get_s3_client, key_from_url
+
+# Limites de l'API S3 (ListObjectsV2 et DeleteObjects)
+PAGE_SIZE = 1000
+DELETE_BATCH_SIZE = 1000
+
+
+@dataclass
+class GCReport:
+    scanned: int = 0
+    scanned_bytes: int = 0
+    recent: int = 0
+    orphans: int = 0
+    orphan_bytes: int = 0
+    deleted: int = 0
+    aborted_uploads: int = 0
+    errors: list = field(default_factory=list)
+    # Références sans clé R2 reconnue : aucune suppression dans ce cas
+    unmapped: list = field(default_factory=list)
+
+
+def _derivative_urls(derivatives):
+    for entries in (derivatives or {}).values():
+        for _, url in entries:
+            yield url
+
+
+def reference_key(url, prefixes):
+    """Clé R2 désignée par `url` (URL publique ou non, ou clé nue), None si inconnue."""
+    key = key_from_url(url)
+    if key:
+        return key
+    path = url.split('?', 1)[0].split('#', 1)[0]
+    if not re.match(r'^[a-z][a-z0-9+.-]*:', path, re.IGNORECASE):
+        # Clé enregistrée telle quelle
+        path = '/' + path.lstrip('/')
+    # Premier préfixe géré trouvé dans le chemin (« https://https://cdn/videos/... »)
+    positions = [path.find('/' + prefix) for prefix in prefixes]
+    positions = [position for position in positions if position >= 0]
+    if not positions:
+        return None
+    return path[min(positions) + 1:] or None
+
+
+def referenced_keys(prefixes=None):
+    """
+    (clés référencées, préfixes HLS référencés, références non rattachées),
+    en une requête par table.
+    """
+    prefixes = settings.GC_PREFIXES if prefixes is None else prefixes
+    urls = []
+    manifests = []
+    videos = Video.objects.order_by().values_list('video_file', 'cover_image', 'cover_derivatives', 'hls_manifest')
+    for video_file, cover_image, derivatives, manifest in videos.iterator(chunk_size=2000):
+        urls += [video_file, cover_image, *_derivative_urls(derivatives)]
+        manifests.append(manifest)
+    photos = Photo.objects.order_by().values_list('photo_file', 'photo_derivatives')
+    for photo_file, derivatives in photos.iterator(chunk_size=2000):
+        urls += [photo_file, *_derivative_urls(derivatives)]
+    # Packagings encore décrits par des Rendition (publication en cours)
+    manifests += Rendition.objects.order_by().exclude(playlist='').values_list('playlist', flat=True)
+
+    keys, hls_prefixes, unmapped = set(), set(), []
+    for url in urls:
+        if not url:
+            continue
+        key = reference_key(url, prefixes)
+        if key is None:
+            unmapped.append(url)
+        else:
+            keys.add(key)
+    for url in manifests:
+        if not url:
+            continue
+        key = reference_key(url, ['hls/'])
+        if key is None:
+            unmapped.append(url)
+        else:
+            hls_prefixes.add(key_package_prefix(key))
+    return keys, hls_prefixes - {''}, unmapped
+
+
+def iter_objects(s3, prefix):
+    paginator = s3.get_paginator('list_objects_v2')
+    pages = paginator.paginate(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME, Prefix=prefix, PaginationConfig={'PageSize': PAGE_SIZE},
+    )
+    for page in pages:
+        yield from page.get('Contents', [])
+
+
+def _delete(s3, keys, report):
+    response = s3.delete_objects(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+        Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True},
+    )
+    errors = response.get('Errors', [])
+    report.deleted += len(keys) - len(errors)
+    report.errors += [f"{error.get('Key')} : {error.get('Message')}" for error in errors]
+
+
+def abort_stale_uploads(s3, prefixes, cutoff, dry_run, report):
+    """Abandonne les uploads multipart sous `prefixes` commencés avant `cutoff`."""
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+    paginator = s3.get_paginator('list_multipart_uploads')
+    for prefix in prefixes:
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for upload in page.get('Uploads', []):
+                if upload['Initiated'] >= cutoff:
+                    continue
+                report.aborted_uploads += 1
+                if not dry_run:
+                    s3.abort_multipart_upload(Bucket=bucket, Key=upload['Key'], UploadId=upload['UploadId'])
+
+
+def collect_garbage(prefixes=None, min_age_hours=None, dry_run=False, on_orphan=None):
+    """
+    Supprime (ou, avec dry_run, compte seulement) les objets orphelins sous
+    `prefixes`. `on_orphan(obj)` est appelé pour chaque orphelin trouvé.
+
+    Si des références ne peuvent pas être rattachées à une clé
+    (report.unmapped), le passage se fait en simulation.
+    """
+    prefixes = prefixes or settings.GC_PREFIXES
+    min_age_hours = settings.GC_MIN_AGE_HOURS if min_age_hours is None else min_age_hours
+    cutoff = timezone.now() - timedelta(hours=min_age_hours)
+
+    s3 = get_s3_client()
+    report = GCReport()
+    keys, hls_prefixes, report.unmapped = referenced_keys()
+    # Un objet encore référencé passerait pour orphelin : on ne supprime rien
+    dry_run = dry_run or bool(report.unmapped)
+    batch = []
+
+    for prefix in prefixes:
+        for obj in iter_objects(s3, prefix):
+            report.scanned += 1
+            report.scanned_bytes += obj['Size']
+            key = obj['Key']
+            if key in keys or key_package_prefix(key) in hls_prefixes:
+                continue
+            if obj['LastModified'] >= cutoff:
+                report.recent += 1
+                continue
+
+            report.orphans += 1
+            report.orphan_bytes += obj['Size']
+            if on_orphan:
+                on_orphan(obj)
+            if not dry_run:
+                batch.append(key)
+                if len(batch) >= DELETE_BATCH_SIZE:
+                    _delete(s3, batch, report)
+                    batch = []
+    if batch:
+        _delete(s3, batch, report)
+
+    abort_stale_uploads(s3, prefixes, cutoff, dry_run, report)
+    return report
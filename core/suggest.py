@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Suggestions de recherche (autocomplétion) depuis un index de préfixes en mémoire.
+
+L'index est un tableau trié de clés normalisées (minuscules, sans accents),
+une par début de mot de chaque titre de vidéo / photo et nom de catégorie.
+Une recherche de préfixe est une recherche dichotomique (bisect) suivie d'un
+parcours des entrées contiguës : aucune requête SQL sur le chemin de la
+requête une fois l'index construit.
+
+L'index est construit à la première utilisation, tenu à jour par core.signals
+pour les écritures de ce processus, et reconstruit entièrement toutes les
+SUGGEST_REBUILD_INTERVAL secondes pour intégrer celles des autres workers.
+Cette reconstruction se fait dans un thread de fond : les requêtes
+continuent d'utiliser l'ancien index pendant ce temps. Seule la toute
+première construction est attendue. Les écritures faites pendant une
+reconstruction sont notées et rejouées sur le nouvel index avant qu'il ne
+remplace l'ancien : elles ne sont pas perdues jusqu'au cycle suivant.
+"""
+import bisect
+import logging
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Nombre maximum d'entrées examinées pour un préfixe très court
+SCAN_LIMIT = 200
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower().strip()
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._keys = []        # clés triées
+        self._entries = []     # (kind, id, label, position du mot), aligné sur _keys
+        self._by_object = {}   # (kind, id) -> liste des clés de l'objet
+        self._lock = threading.Lock()
+        # Écritures pendant une reconstruction (None hors reconstruction)
+        self._changes = None
+        self.built_at = None
+
+    def _insert(self, kind, obj_id, label):
+        keys = []
+        words = normalize(label).split()
+        for position in range(len(words)):
+            key = ' '.join(words[position:])
+            i = bisect.bisect_left(self._keys, key)
+            self._keys.insert(i, key)
+            self._entries.insert(i, (kind, obj_id, label, position))
+            keys.append(key)
+        self._by_object[(kind, obj_id)] = keys
+
+    def _delete(self, kind, obj_id):
+        for key in self._by_object.pop((kind, obj_id), []):
+            i = bisect.bisect_left(self._keys, key)
+            while i < len(self._keys) and self._keys[i] == key:
+                if self._entries[i][:2] == (kind, obj_id):
+                    del self._keys[i]
+                    del self._entries[i]
+                    break
+                i += 1
+
+    @property
+    def rebuilding(self):
+        return self._changes is not None
+
+    def rebuild(self, items):
+        """Remplace tout le contenu ; `items` est un itérable de (kind, id, label)."""
+        with self._lock:
+            self._changes = []
+        try:
+            pairs = []
+            by_object = {}
+            for kind, obj_id, label in items:
+                words = normalize(label).split()
+                keys = [' '.join(words[position:]) for position in range(len(words))]
+                pairs.extend((key, (kind, obj_id, label, position)) for position, key in enumerate(keys))
+                by_object[(kind, obj_id)] = keys
+            pairs.sort(key=lambda pair: pair[0])
+        except BaseException:
+            with self._lock:
+                self._changes = None
+            raise
+        with self._lock:
+            self._keys = [key for key, _ in pairs]
+            self._entries = [entry for _, entry in pairs]
+            self._by_object = by_object
+            # Écritures postérieures à la lecture de la base (ou concurrentes)
+            for kind, obj_id, label in self._changes:
+                self._delete(kind, obj_id)
+                if label is not None:
+                    self._insert(kind, obj_id, label)
+            self._changes = None
+            self.built_at = time.monotonic()
+
+    def upsert(self, kind, obj_id, label):
+        with self._lock:
+            self._delete(kind, obj_id)
+            self._insert(kind, obj_id, label)
+            if self._changes is not None:
+                self._changes.append((kind, obj_id, label))
+
+    def remove(self, kind, obj_id):
+        with self._lock:
+            self._delete(kind, obj_id)
+            if self._changes is not None:
+                self._changes.append((kind, obj_id, None))
+
+    def lookup(self, prefix, limit=10):
+        """Jusqu'à `limit` entrées (kind, id, label) dont un mot commence par `prefix`."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            start = bisect.bisect_left(self._keys, prefix)
+            matches = []
+            for i in range(start, min(start + SCAN_LIMIT, len(self._keys))):
+                if not self._keys[i].startswith(prefix):
+                    break
+                matches.append(self._entries[i])
+
+        # Les titres qui commencent par le préfixe d'abord, puis les plus courts
+        matches.sort(key=lambda entry: (entry[3], len(entry[2])))
+        results, seen = [], set()
+        for kind, obj_id, label, _ in matches:
+            if (kind, obj_id) in seen:
+                continue
+            seen.add((kind, obj_id))
+            results.append((kind, obj_id, label))
+            if len(results) >= limit:
+                break
+        return results
+
+
+_index = PrefixIndex()
+_build_lock = threading.Lock()
+
+
+def _load_items():
+    from .models import Category, Photo, Video
+
+    for obj_id, title in Video.objects.values_list('id', 'title').iterator():
+        yield 'video', obj_id, title
+    for obj_id, title in Photo.objects.values_list('id', 'title').iterator():
+        yield 'photo', obj_id, title
+    for obj_id, name in Category.objects.values_list('id', 'name').iterator():
+        yield 'category', obj_id, name
+
+
+def _is_stale():
+    return time.monotonic() - _index.built_at > settings.SUGGEST_REBUILD_INTERVAL
+
+
+def _refresh():
+    """Reconstruction en arrière-plan ; _build_lock est tenu par l'appelant."""
+    try:
+        _index.rebuild(_load_items())
+    except Exception:
+        logger.error("Reconstruction de l'index de suggestions en échec", exc_info=True)
+        # Nouvel essai au prochain intervalle, pas à chaque requête
+        _index.built_at = time.monotonic()
+    finally:
+        # Connexion propre à ce thread
+        connection.close()
+        _build_lock.release()
+
+
+def get_index():
+    """Index du processus : construit s'il est absent, rafraîchi en fond s'il est ancien."""
+    if _index.built_at is None:
+        with _build_lock:
+            if _index.built_at is None:
+                _index.rebuild(_load_items())
+    elif _is_stale() and _build_lock.acquire(blocking=False):
+        # Un seul rafraîchissement à la fois ; les autres servent l'index actuel
+        try:
+            if not _is_stale():
+                _build_lock.release()
+            else:
+                threading.Thread(target=_refresh, name='suggest-rebuild', daemon=True).start()
+        except Exception:
+            _build_lock.release()
+            raise
+    return _index
+
+
+def index_object(kind, obj_id, label):
+    # Inutile de maintenir un index ni construit ni en construction
+    if _index.built_at is not None or _index.rebuilding:
+        _index.upsert(kind, obj_id, label)
+
+
+def unindex_object(kind, obj_id):
+    if _index.built_at is not None or _index.rebuilding:
+        _index.remove(kind, obj_id)
+
+
+def suggest(prefix, limit=10):
+    return get_index().lookup(prefix, limit)
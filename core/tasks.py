@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Tâches de fond exécutées par la file core.jobs (commande run_jobs).
+
+Une exception fait repasser la tâche en attente avec un délai croissant,
+jusqu'à son nombre maximum de tentatives.
+"""
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+
+from .hls import package_video
+from .jobs import enqueue, task
+from .probe import ProbeError, probe
+from .storage import get_s3_client, key_from_url
+from .thumbnails import SOURCE_FIELDS, refresh_derivatives
+
+logger = logging.getLogger(__name__)
+
+# Limite de l'API S3 DeleteObjects
+DELETE_BATCH_SIZE = 1000
+
+
+@task('thumbnails.refresh', concurrency=2)
+def refresh_thumbnails(model, pk):
+    """Génère les miniatures d'une vidéo (couverture) ou d'une photo."""
+    obj = apps.get_model('core', model).objects.filter(pk=pk).first()
+    if obj is None:
+        return
+    stale_keys = refresh_derivatives(obj)
+    if stale_keys:
+        enqueue('storage.delete_objects', keys=stale_keys)
+
+
+@task('media.probe')
+def probe_video(pk):
+    """Renseigne durée, résolution, codecs et débit d'une vidéo depuis son fichier."""
+    video = apps.get_model('core', 'video').objects.filter(pk=pk).first()
+    if video is None:
+        return
+    key = key_from_url(video.video_file)
+    if not key:
+        return
+
+    try:
+        info = probe(key)
+    except ProbeError as exc:
+        # Format non reconnu : une nouvelle tentative donnerait le même résultat
+        logger.warning("Vidéo #%s non analysée : %s", pk, exc)
+        info = None
+
+    fields = ['probed_at', 'updated_at']
+    video.probed_at = timezone.now()
+    if info:
+        if info.duration:
+            video.duration = round(info.duration)
+        video.width, video.height = info.width, info.height
+        video.video_codec, video.audio_codec = info.video_codec[:32], info.audio_codec[:32]
+        video.bitrate = info.bitrate
+        fields += ['duration', 'width', 'height', 'video_codec', 'audio_codec', 'bitrate']
+    video.save(update_fields=fields)
+
+    # Le packaging HLS a besoin de la résolution : il suit l'analyse
+    if settings.HLS_ENABLED and not video.hls_manifest:
+        enqueue('video.package_hls', pk=pk)
+
+
+@task('video.package_hls', max_attempts=3, concurrency=1)
+def package_hls(pk):
+    """Produit les qualités HLS d'une vidéo et sa playlist maîtresse (core.hls)."""
+    video = apps.get_model('core', 'video').objects.filter(pk=pk).first()
+    if video is None:
+        return
+    for prefix in package_video(video):
+        enqueue('storage.delete_prefix', prefix=prefix)
+
+
+@task('storage.delete_objects')
+def delete_objects(keys):
+    """Supprime des objets R2 (fichiers remplacés, anciennes miniatures)."""
+    s3 = get_s3_client()
+    for start in range(0, len(keys), DELETE_BATCH_SIZE):
+        batch = keys[start:start + DELETE_BATCH_SIZE]
+        s3.delete_objects(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+            Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True},
+        )
+
+
+def media_keys(obj, field):
+    """Clés R2 du fichier `field` d'un objet et de ses miniatures éventuelles."""
+    keys = [key_from_url(getattr(obj, field))]
+    model_name = obj._meta.model_name
+    source_field, derivatives_field = SOURCE_FIELDS.get(model_name, (None, None))
+    if field == source_field:
+        for entries in (getattr(obj, derivatives_field) or {}).values():
+            keys.extend(key_from_url(url) for _, url in entries)
+    return [key for key in keys if key]
+
+
+@task('storage.delete_prefix')
+def delete_prefix(prefix):
+    """Supprime tous les objets R2 sous `prefix` (ancien packaging HLS)."""
+    s3 = get_s3_client()
+    paginator = s3.get_paginator('list_objects_v2')
+    # Une page de ListObjectsV2 fait au plus 1000 clés, la limite de DeleteObjects
+    for page in paginator.paginate(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Prefix=prefix.rstrip('/') + '/'):
+        keys = [item['Key'] for item in page.get('Contents', [])]
+        if keys:
+            delete_objects(keys)
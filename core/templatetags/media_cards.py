@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Cache des cartes média (vidéos, photos) rendues dans les grilles.
+
+    {% load media_cards %}
+    {% cached_cards videos "partials/_videos.html" "video" %}
+
+Chaque carte est mise en cache sous une clé qui contient l'id de l'objet,
+son updated_at et son nombre de vues : une modification de l'objet change
+la clé, l'ancienne entrée expire d'elle-même (CARD_CACHE_TTL). Les vues
+sont dans la clé car core.view_counter les incrémente par UPDATE, sans
+toucher updated_at. Toute la grille est lue en un
+seul cache.get_many ; seules les cartes absentes sont rendues, puis écrites
+en un seul cache.set_many.
+
+Le rendu d'une carte ne voit que l'objet (pas l'utilisateur ni la requête) :
+le HTML en cache est identique pour tous les visiteurs.
+
+Images responsives (déclinaisons de core.thumbnails) :
+
+    <source type="image/webp" srcset="{{ photo.photo_derivatives|srcset:'webp' }}">
+    style="background-image: url('{{ video.cover_derivatives|thumbnail:640|default:video.cover_image }}')"
+"""
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+def card_cache_key(template_name, obj):
+    version = int(obj.updated_at.timestamp() * 1_000_000) if getattr(obj, 'updated_at', None) else 0
+    views = getattr(obj, 'views', 0)
+    return f"card:{template_name}:{obj._meta.label_lower}:{obj.pk}:{version}:{views}"
+
+
+@register.simple_tag(takes_context=True)
+def cached_cards(context, objects, template_name, var_name):
+    """Rend `template_name` pour chaque objet (sous le nom `var_name`), via le cache."""
+    objects = list(objects)
+    if not objects:
+        return ''
+
+    keys = [card_cache_key(template_name, obj) for obj in objects]
+    cached = cache.get_many(keys)
+
+    card_template = context.template.engine.get_template(template_name)
+    missing = {}
+    html = []
+    for key, obj in zip(keys, objects):
+        fragment = cached.get(key)
+        if fragment is None:
+            fragment = missing[key] = card_template.render(context.new({var_name: obj}))
+        html.append(fragment)
+
+    if missing:
+        cache.set_many(missing, settings.CARD_CACHE_TTL)
+    return mark_safe(''.join(html))
+
+
+@register.filter
+def srcset(derivatives, fmt):
+    """Attribut srcset (« url 320w, url 640w ») pour un format de déclinaison."""
+    entries = (derivatives or {}).get(fmt) or []
+    return ', '.join(f"{url} {width}w" for width, url in entries)
+
+
+@register.filter
+def thumbnail(derivatives, min_width):
+    """Plus petite déclinaison d'au moins `min_width` pixels (WebP, sinon JPEG)."""
+    for fmt in ('webp', 'jpeg'):
+        entries = (derivatives or {}).get(fmt) or []
+        for width, url in entries:
+            if width >= int(min_width):
+                return url
+        if entries:
+            return entries[-1][1]
+    return ''
@@ -1,3 +1,846 @@
-from django.test import TestCase
+import importlib.util
+import io
+import os
+import struct
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.utils import ConnectionHandler
+from django.db.models import Count, F, QuerySet
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    async_storage, backfill, caching, entitlements, homepage, jobs, probe, search, storage_gc, suggest, thumbnails,
+    view_counter,
+)
+from .caching import local_cache
+from .models import (
+    Category, Comment, Job, Like, Photo, PhotoComment, PhotoLike, UserSubscription, Video, VideoComment,
+    VideoLike,
+)
+from .pagination import after_cursor, encode_cursor, keyset_page
+from .templatetags.media_cards import card_cache_key
+
+User = get_user_model()
+
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=0)
+class QueryBudgetTests(TestCase):
+    """
+    Budgets de requêtes SQL par vue.
+
+    Chaque vue est appelée avec peu puis beaucoup de contenus : le nombre de
+    requêtes doit rester identique (pas de requête par ligne affichée) et ne
+    pas dépasser le budget fixé. Si un test échoue après une modification,
+    c'est probablement qu'un select_related / for_feed() a disparu.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer', 'viewer@example.com', 'pw')
+        cls.category = Category.objects.create(name='Sport', slug='sport')
+        cls.video = Video.objects.create(user=cls.user, title='Match principal', category=cls.category)
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.client.force_login(self.user)
+
+    def add_content(self, count):
+        for i in range(count):
+            author = User.objects.create_user(f'author{i}_{Video.objects.count()}')
+            video = Video.objects.create(user=author, title=f'Match {i}', category=self.category)
+            photo = Photo.objects.create(user=author, title=f'Match photo {i}', category=self.category)
+            VideoComment.objects.create(user=author, video=self.video, text='bravo')
+            PhotoComment.objects.create(user=author, photo=photo, text='bravo')
+            VideoLike.objects.create(user=author, video=video)
+
+    def count_queries(self, url, params=None):
+        cache.clear()
+        local_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertQueryBudget(self, url, budget, params=None):
+        self.add_content(2)
+        few = self.count_queries(url, params)
+        self.add_content(8)
+        many = self.count_queries(url, params)
+        self.assertEqual(few, many, f"{url} : {few} requêtes avec peu de contenus, {many} avec plus")
+        self.assertLessEqual(many, budget, f"{url} : {many} requêtes (budget {budget})")
+
+    def test_index(self):
+        self.assertQueryBudget(reverse('index'), 6)
+
+    def test_home(self):
+        self.assertQueryBudget(reverse('home'), 5)
+
+    def test_video_user(self):
+        self.assertQueryBudget(reverse('video_user'), 3)
+
+    def test_photo_user(self):
+        self.assertQueryBudget(reverse('photo_user'), 3)
+
+    def test_user_content(self):
+        self.assertQueryBudget(reverse('user_content'), 6)
+
+    def test_search_results(self):
+        self.assertQueryBudget(reverse('search_results'), 7, {'q': 'match'})
+
+    def test_video_player(self):
+        self.assertQueryBudget(reverse('video_player', args=[self.video.id]), 11)
+
+    def test_feed_api(self):
+        self.assertQueryBudget(reverse('feed_api', args=['photos']), 1)
+
+    def test_photo_comments(self):
+        photo = Photo.objects.create(user=self.user, title='Photo commentée')
+        PhotoComment.objects.create(user=self.user, photo=photo, text='premier')
+        self.add_content(2)
+        few = self.count_queries(reverse('get_photo_comments', args=[photo.id]))
+        for i in range(8):
+            PhotoComment.objects.create(user=User.objects.create_user(f'commenter{i}'), photo=photo, text='encore')
+        many = self.count_queries(reverse('get_photo_comments', args=[photo.id]))
+        self.assertEqual(few, many)
+
+
+class IndexUsageTests(TestCase):
+    """
+    Les requêtes chaudes (flux, commentaires, compteurs) doivent passer par
+    les index de core.models, sans tri de toute la table.
+
+    Sur PostgreSQL, les parcours séquentiels sont désactivés : sur des tables
+    de test presque vides, le planificateur les préférerait à tout index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('indexed')
+        cls.category = Category.objects.create(name='Cinéma', slug='cinema')
+        cls.video = Video.objects.create(user=cls.user, title='Film', category=cls.category)
+        cls.photo = Photo.objects.create(user=cls.user, title='Affiche', category=cls.category)
+
+    def plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def assertUsesIndex(self, queryset, index_name, covering=False):
+        plan = self.plan(queryset)
+        self.assertRegex(plan, index_name)
+        # Pas de tri : l'ordre est celui de l'index
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertNotRegex(plan, r'(?m)^\s*(->\s*)?Sort\b')
+        if covering:
+            self.assertRegex(plan, 'Index Only Scan|COVERING INDEX')
+
+    def test_feeds(self):
+        self.assertUsesIndex(Video.objects.order_by('-created_at', '-pk')[:25], 'core_video_feed_idx')
+        self.assertUsesIndex(Photo.objects.order_by('-created_at', '-pk')[:25], 'core_photo_feed_idx')
+
+    def test_deep_page(self):
+        # Page suivante : le curseur borne le parcours de l'index (Index Cond)
+        videos = after_cursor(Video.objects.all(), encode_cursor(self.video))[:25]
+        self.assertUsesIndex(videos, 'core_video_feed_idx')
+        if connection.vendor == 'postgresql':
+            self.assertRegex(self.plan(videos), r'Index Cond: \(created_at <=')
+
+    def test_user_content(self):
+        videos = Video.objects.filter(user=self.user).order_by('-created_at', '-pk')[:25]
+        self.assertUsesIndex(videos, 'core_video_user_feed_idx')
+        photos = Photo.objects.filter(user=self.user).order_by('-created_at', '-pk')[:25]
+        self.assertUsesIndex(photos, 'core_photo_user_feed_idx')
+
+    def test_similar_videos(self):
+        similar = Video.objects.filter(category=self.category).order_by('-created_at')[:4]
+        self.assertUsesIndex(similar, 'core_video_category_feed_idx')
+
+    def test_comments(self):
+        comments = VideoComment.objects.filter(video=self.video).order_by('-created_at')
+        self.assertUsesIndex(comments, 'core_videocomment_recent_idx')
+        comments = PhotoComment.objects.filter(photo=self.photo).order_by('-created_at')
+        self.assertUsesIndex(comments, 'core_photocomment_recent_idx')
+
+    def test_like_counters(self):
+        # Requêtes de comptage de reconcile_counters : l'index de la contrainte
+        # unique suffit (index anonyme « sqlite_autoindex_* » sous SQLite)
+        likes = VideoLike.objects.filter(video=self.video).order_by().values('video').annotate(total=Count('*'))
+        self.assertUsesIndex(likes, 'core_videolike_video_user_uniq|sqlite_autoindex_core_videolike', covering=True)
+        likes = PhotoLike.objects.filter(photo=self.photo).order_by().values('photo').annotate(total=Count('*'))
+        self.assertUsesIndex(likes, 'core_photolike_photo_user_uniq|sqlite_autoindex_core_photolike', covering=True)
+
+
+class JobQueueTests(TestCase):
+    """Réservation et conclusion des tâches de fond (core.jobs)."""
+
+    def setUp(self):
+        jobs.task('tests.limited', concurrency=2)(lambda: None)
+        jobs.task('tests.free')(lambda: None)
+        self.addCleanup(jobs._registry.pop, 'tests.limited')
+        self.addCleanup(jobs._registry.pop, 'tests.free')
+
+    def test_claim_respects_task_concurrency(self):
+        for _ in range(4):
+            jobs.enqueue('tests.limited')
+        jobs.enqueue('tests.free')
+
+        claimed = jobs.claim('worker-a', 10)
+        self.assertEqual(sorted(job.name for job in claimed), ['tests.free', 'tests.limited', 'tests.limited'])
+        # Une exécution déjà en cours compte dans la limite
+        self.assertEqual([job.name for job in jobs.claim('worker-b', 10, {'tests.limited': 1})], ['tests.limited'])
+
+    def test_reclaimed_job_result_is_ignored(self):
+        jobs.enqueue('tests.free')
+        [stale] = jobs.claim('worker-a', 1)
+        # Reprise par un autre worker après JOB_LOCK_TIMEOUT
+        Job.objects.filter(pk=stale.pk).update(locked_by='worker-b', attempts=2)
+
+        jobs.run_job(stale)
+        job = Job.objects.get(pk=stale.pk)
+        self.assertEqual((job.status, job.locked_by), (Job.RUNNING, 'worker-b'))
+
+    def test_heartbeat_keeps_long_job_locked(self):
+        jobs.enqueue('tests.free')
+        worker = jobs.Worker()
+        [job] = jobs.claim(worker.worker_id, 1)
+        long_ago = job.locked_at - timedelta(seconds=settings.JOB_LOCK_TIMEOUT + 1)
+        Job.objects.filter(pk=job.pk).update(locked_at=long_ago)
+        worker._running_ids.add(job.pk)
+
+        worker._heartbeat()
+        # Toujours à ce worker : plus réservable par un autre
+        self.assertEqual(jobs.claim('worker-b', 1), [])
+
+
+class CacheInvalidationTests(TestCase):
+    """Les caches ne sont invalidés qu'une fois l'écriture validée (core.signals)."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_subscription_invalidates_entitlements_on_commit(self):
+        user = User.objects.create_user('subscriber')
+        self.assertIsNone(entitlements.get_subscription_end(user.pk))
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            end_date = timezone.now() + timedelta(days=30)
+            UserSubscription.objects.create(user=user, start_date=timezone.now(), end_date=end_date)
+        # Avant la validation : l'entrée « aucun abonnement » est encore là
+        self.assertIsNone(entitlements.get_subscription_end(user.pk))
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(entitlements.get_subscription_end(user.pk), end_date)
+
+    def test_card_key_follows_view_count(self):
+        user = User.objects.create_user('uploader')
+        video = Video.objects.create(user=user, title='Carte')
+        key = card_cache_key('partials/_videos.html', video)
+
+        # core.view_counter incrémente les vues sans toucher updated_at
+        Video.objects.filter(pk=video.pk).update(views=F('views') + 3)
+        video.refresh_from_db()
+        self.assertNotEqual(card_cache_key('partials/_videos.html', video), key)
+
+
+class AsyncStorageTests(SimpleTestCase):
+    """Un client httpx par boucle d'événements, fermé à l'arrêt de la boucle."""
+
+    def test_http_client_closed_with_its_loop(self):
+        async def get_client():
+            client = async_storage.get_http_client()
+            self.assertIs(async_storage.get_http_client(), client)
+            return client
+
+        first = async_to_sync(get_client)()
+        second = async_to_sync(get_client)()
+        self.assertIsNot(first, second)
+        self.assertTrue(first.is_closed)
+        self.assertTrue(second.is_closed)
+        self.assertEqual(async_storage._http_clients, {})
+
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=60)
+class ViewCounterTests(TestCase):
+    """Vues bufferisées en mémoire puis reportées par flush_views (core.view_counter)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('uploader')
+        cls.first = Video.objects.create(user=user, title='Première', views=5)
+        cls.second = Video.objects.create(user=user, title='Seconde')
+
+    def setUp(self):
+        view_counter._pending.clear()
+        self.addCleanup(view_counter._pending.clear)
+        # Pas de thread de fond : le test appelle flush_views lui-même
+        patcher = mock.patch.object(view_counter, '_ensure_flusher')
+        self.ensure_flusher = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record(self):
+        with self.assertNumQueries(0):
+            for video in (self.first, self.first, self.second):
+                view_counter.record_view(video.pk)
+        self.ensure_flusher.assert_called()
+
+    def test_flush_increments_views(self):
+        self.record()
+        self.assertEqual(view_counter.pending_views(self.first.pk), 2)
+
+        self.assertEqual(view_counter.flush_views(), 2)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.views, self.second.views), (7, 1))
+        self.assertEqual(view_counter.pending_views(self.first.pk), 0)
+        self.assertEqual(view_counter.flush_views(), 0)
+
+    def test_failed_flush_keeps_deltas(self):
+        self.record()
+        with mock.patch.object(QuerySet, 'update', side_effect=DatabaseError), \
+                self.assertLogs('core.view_counter', 'ERROR'):
+            self.assertEqual(view_counter.flush_views(), 0)
+        self.assertEqual(view_counter.pending_views(self.first.pk), 2)
+        self.assertEqual(view_counter.pending_views(self.second.pk), 1)
+
+        self.assertEqual(view_counter.flush_views(), 2)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.views, 7)
+
+
+class ConnectionPoolSettingsTests(SimpleTestCase):
+    """DB_CONNECTION_MODE=pool : Django doit pouvoir construire le pool psycopg."""
+
+    def load_settings(self, **environ):
+        spec = importlib.util.find_spec('stream.settings')
+        module = importlib.util.module_from_spec(spec)
+        with mock.patch.dict(os.environ, environ):
+            spec.loader.exec_module(module)
+        return module
+
+    def test_pool_mode_builds_pool(self):
+        try:
+            from psycopg_pool import ConnectionPool
+        except ImportError:
+            self.skipTest("psycopg[pool] n'est pas installé")
+
+        database = self.load_settings(DB_CONNECTION_MODE='pool').DATABASES['default']
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('check', database['OPTIONS']['pool'])
+
+        # Le pool est créé fermé (open=False) : aucune connexion au serveur.
+        # Alias à part : ne pas toucher au pool de la base des tests
+        wrapper = ConnectionHandler({'default': {}, 'pool_test': database})['pool_test']
+        self.addCleanup(wrapper.close_pool)
+        self.assertIsInstance(wrapper.pool, ConnectionPool)
+        self.assertEqual(wrapper.pool.max_size, database['OPTIONS']['pool']['max_size'])
+
+
+class CounterTests(TestCase):
+    """Les compteurs ne changent que par UPDATE ... F() (core.signals, core.view_counter)."""
+
+    def test_stale_instance_keeps_counters(self):
+        user = User.objects.create_user('fan')
+        video = Video.objects.create(user=user, title='Avant')
+        stale = Video.objects.get(pk=video.pk)
+
+        VideoLike.objects.create(video=video, user=user)
+        VideoComment.objects.create(video=video, user=user, text='Bravo')
+        Video.objects.filter(pk=video.pk).update(views=F('views') + 4)
+
+        stale.title = 'Après'
+        stale.save()
+        video.refresh_from_db()
+        self.assertEqual(video.title, 'Après')
+        self.assertEqual((video.like_count, video.comment_count, video.views), (1, 1, 4))
+
+
+class KeysetPaginationTests(TestCase):
+    """Parcours complet d'un flux par curseurs (core.pagination)."""
+
+    def test_cursor_walk_with_tied_dates(self):
+        user = User.objects.create_user('prolific')
+        videos = [Video.objects.create(user=user, title=f'Vidéo {n}') for n in range(7)]
+        # Mises en ligne groupées : plusieurs vidéos à la même date
+        now = timezone.now()
+        dates = [now, now, now, now - timedelta(hours=1), now - timedelta(hours=1), now - timedelta(hours=2), now]
+        for video, created_at in zip(videos, dates):
+            Video.objects.filter(pk=video.pk).update(created_at=created_at)
+        expected = list(Video.objects.order_by('-created_at', '-pk').values_list('pk', flat=True))
+
+        seen = []
+        cursor = None
+        for _ in range(len(videos)):
+            page = keyset_page(Video.objects.all(), cursor, page_size=2)
+            seen += [video.pk for video in page.items]
+            cursor = page.next_cursor
+            if not page.has_next:
+                break
+        # Ni doublon ni élément sauté, dans l'ordre du flux
+        self.assertEqual(seen, expected)
+
+
+@override_settings(R2_CDN_DOMAIN='cdn.example.com')
+class DerivativesTests(TestCase):
+    """Miniatures (core.thumbnails) après le changement d'une couverture ou d'une photo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('editor')
+        cls.video = Video.objects.create(
+            user=cls.user, title='Clip', cover_image='https://cdn.example.com/covers/old.jpg',
+            cover_derivatives={'webp': [[320, 'https://cdn.example.com/derivatives/covers/old/320.webp']]},
+        )
+
+    def test_cover_change_resets_derivatives(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('update_video_api', args=[self.video.pk]),
+            {'title': 'Clip', 'new_cover_url': 'https://cdn.example.com/covers/new.jpg'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.cover_derivatives, {})
+        refresh = Job.objects.filter(name='thumbnails.refresh', payload={'model': 'video', 'pk': self.video.pk})
+        self.assertTrue(refresh.exists())
+
+    def test_replaced_cover_deleted_after_caches_expire(self):
+        self.client.force_login(self.user)
+        new_cover = SimpleUploadedFile('new.jpg', b'jpeg', content_type='image/jpeg')
+        with mock.patch('core.views.stream_upload'), mock.patch('core.views.get_s3_client'):
+            response = self.client.post(reverse('replace_media'), {
+                'object_id': self.video.pk, 'object_type': 'video', 'media_type': 'cover', 'new_file': new_cover,
+            })
+        self.assertEqual(response.status_code, 200)
+
+        delete = Job.objects.get(name='storage.delete_objects')
+        self.assertEqual(delete.payload['keys'], ['covers/old.jpg', 'derivatives/covers/old/320.webp'])
+        # Page d'accueil (périmée comprise) et cartes en cache expirées avant la suppression
+        min_delay = max(settings.HOMEPAGE_CACHE_TTL + settings.CACHE_STALE_GRACE, settings.CARD_CACHE_TTL)
+        self.assertGreaterEqual(delete.run_at, timezone.now() + timedelta(seconds=min_delay))
+
+    def test_replaced_source_is_not_published(self):
+        old_derivatives = self.video.cover_derivatives
+        derivatives = {'webp': [[320, 'https://cdn.example.com/derivatives/covers/old-bis/320.webp']]}
+        # La couverture change pendant la génération des miniatures
+        def replace_cover(source_url):
+            Video.objects.filter(pk=self.video.pk).update(cover_image='https://cdn.example.com/covers/new.jpg')
+            return derivatives
+
+        with mock.patch.object(thumbnails, 'generate_derivatives', side_effect=replace_cover):
+            stale_keys = thumbnails.refresh_derivatives(Video.objects.get(pk=self.video.pk))
+        self.assertEqual(stale_keys, ['derivatives/covers/old-bis/320.webp'])
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.cover_image, 'https://cdn.example.com/covers/new.jpg')
+        self.assertEqual(self.video.cover_derivatives, old_derivatives)
+
+
+class BackfillTests(TestCase):
+    """Recopie Like / Comment -> tables par type de contenu (core.backfill, backfill_interactions)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('legacy')
+        cls.other = User.objects.create_user('newcomer')
+        cls.video = Video.objects.create(user=cls.user, title='Ancienne')
+
+    def test_backfill_copies_and_removes_deleted_rows(self):
+        before_cutover = timezone.now() - timedelta(days=1)
+        kept = Comment.objects.create(user=self.user, video=self.video, text='Reste')
+        removed = Comment.objects.create(user=self.user, video=self.video, text='Supprimé')
+        Comment.objects.filter(pk__in=[kept.pk, removed.pk]).update(created_at=before_cutover)
+        backfill.copy_rows(django_apps, connection)
+        self.assertEqual(VideoComment.objects.count(), 2)
+
+        # Pendant le déploiement : suppression sur un ancien processus,
+        # nouveau commentaire sur un nouveau
+        removed.delete()
+        written_by_new_code = VideoComment.objects.create(user=self.other, video=self.video, text='Nouveau')
+        call_command('backfill_interactions', stdout=io.StringIO())
+
+        self.assertQuerySetEqual(
+            VideoComment.objects.order_by('pk').values_list('pk', flat=True),
+            [kept.pk, written_by_new_code.pk],
+        )
+
+    def test_id_collision_fails_loudly(self):
+        legacy = Like.objects.create(user=self.user, video=self.video)
+        # Id déjà pris dans la nouvelle table par un autre like
+        VideoLike.objects.create(pk=legacy.pk, user=self.other, video=self.video)
+        with self.assertRaises(backfill.BackfillConflict):
+            backfill.copy_rows(django_apps, connection)
+
+
+class FakeRangeClient:
+    """Client S3 minimal : get_object avec Range sur un contenu en mémoire."""
+
+    def __init__(self, content):
+        self.content = content
+        self.requests = []
+
+    def get_object(self, Bucket, Key, Range):
+        start, end = map(int, Range.removeprefix('bytes=').split('-'))
+        self.requests.append((start, end))
+        data = self.content[start:end + 1]
+        return {
+            'Body': io.BytesIO(data),
+            'ContentRange': f"bytes {start}-{start + len(data) - 1}/{len(self.content)}",
+        }
+
+
+def mp4_box(box_type, *children):
+    payload = b''.join(children)
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def ebml(element_id, *children, size=None):
+    payload = b''.join(children)
+    if size is None:
+        size = len(payload)
+    # Taille sur 8 octets (marqueur 0x01 puis 7 octets)
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big') + b'\x01' + size.to_bytes(7, 'big') + payload
+
+
+@override_settings(PROBE_CHUNK_SIZE=1024, PROBE_MAX_BYTES=64 * 1024)
+class ProbeTests(SimpleTestCase):
+    """Lecture des en-têtes MP4 / Matroska (core.probe) par requêtes Range."""
+
+    def probe(self, content):
+        self.client = FakeRangeClient(content)
+        return probe.probe('videos/test', client=self.client)
+
+    def mp4_track(self, handler, codec, tkhd=b''):
+        stsd = mp4_box(
+            b'stsd', b'\0' * 4, struct.pack('>I', 1),
+            # Entrée : taille, format, 24 octets, largeur et hauteur codées
+            struct.pack('>I4s', 36, codec), b'\0' * 24, struct.pack('>HH', 640, 360),
+        )
+        hdlr = mp4_box(b'hdlr', b'\0' * 8, handler, b'\0' * 12)
+        mdia = mp4_box(b'mdia', hdlr, mp4_box(b'minf', mp4_box(b'stbl', stsd)))
+        return mp4_box(b'trak', tkhd, mdia)
+
+    def mp4(self, mvhd, video_tkhd=b'', mdat_size=20_000):
+        moov = mp4_box(
+            b'moov', mvhd, mp4_box(b'udta', b'\0' * 10),  # boîte inconnue, ignorée
+            self.mp4_track(b'vide', b'avc1', video_tkhd),
+            self.mp4_track(b'soun', b'mp4a'),
+        )
+        # moov en fin de fichier, après les données
+        return mp4_box(b'ftyp', b'isom\0\0\0\0isom') + mp4_box(b'mdat', b'\0' * mdat_size) + moov
+
+    def test_mp4_v0(self):
+        mvhd = mp4_box(b'mvhd', b'\0' * 4, struct.pack('>IIII', 0, 0, 1000, 12_500), b'\0' * 80)
+        tkhd = mp4_box(b'tkhd', b'\0' * 76, struct.pack('>II', 1920 << 16, 1080 << 16))
+        content = self.mp4(mvhd, tkhd)
+        info = self.probe(content)
+        self.assertEqual(info.duration, 12.5)
+        self.assertEqual((info.width, info.height), (1920, 1080))
+        self.assertEqual((info.video_codec, info.audio_codec), ('avc1', 'mp4a'))
+        self.assertEqual(info.size, len(content))
+        self.assertEqual(info.bitrate, int(len(content) * 8 / 12.5))
+        # mdat sauté sans être lu
+        self.assertLess(sum(end - start + 1 for start, end in self.client.requests), len(content) // 2)
+
+    def test_mp4_v1_without_tkhd(self):
+        mvhd = mp4_box(b'mvhd', b'\x01\0\0\0', struct.pack('>QQIQ', 0, 0, 90_000, 90_000 * 60), b'\0' * 80)
+        info = self.probe(self.mp4(mvhd))
+        self.assertEqual(info.duration, 60)
+        # Dimensions lues dans l'entrée visuelle de stsd
+        self.assertEqual((info.width, info.height), (640, 360))
+
+    def test_mp4_without_mvhd(self):
+        info = self.probe(self.mp4(b''))
+        self.assertIsNone(info.duration)
+        self.assertIsNone(info.bitrate)
+        self.assertEqual(info.video_codec, 'avc1')
+
+    def test_mp4_truncated(self):
+        mvhd = mp4_box(b'mvhd', b'\0' * 4, struct.pack('>IIII', 0, 0, 1000, 12_500), b'\0' * 80)
+        content = self.mp4(mvhd, mdat_size=100)
+        moov = content.index(b'moov') - 4
+
+        # Pistes coupées : ce qui est lisible est gardé, le reste reste vide
+        info = self.probe(content[:moov + 8 + len(mvhd) + 40])
+        self.assertEqual(info.duration, 12.5)
+        self.assertEqual((info.video_codec, info.width), ('', None))
+
+        # mvhd coupé, puis aucune boîte moov : ProbeError, pas struct.error
+        for end in (moov + 8 + 16, moov):
+            with self.subTest(end=end), self.assertRaises(probe.ProbeError):
+                self.probe(content[:end])
+
+    def mkv(self, segment_size=None):
+        info = ebml(
+            probe.INFO,
+            ebml(probe.TIMECODE_SCALE, (1_000_000).to_bytes(3, 'big')),
+            ebml(probe.DURATION, struct.pack('>f', 12_500.0)),
+        )
+        video = ebml(
+            probe.TRACK_ENTRY,
+            ebml(probe.TRACK_TYPE, b'\x01'), ebml(probe.CODEC_ID, b'V_VP9'),
+            ebml(
+                probe.VIDEO,
+                ebml(probe.PIXEL_WIDTH, (1280).to_bytes(2, 'big')),
+                ebml(probe.PIXEL_HEIGHT, (720).to_bytes(2, 'big')),
+            ),
+        )
+        audio = ebml(probe.TRACK_ENTRY, ebml(probe.TRACK_TYPE, b'\x02'), ebml(probe.CODEC_ID, b'A_OPUS'))
+        # Élément inconnu (Void) avant Info, Cluster après Tracks
+        children = [ebml(0xEC, b'\0' * 32), info, ebml(probe.TRACKS, video, audio), ebml(0x1F43B675, b'\0' * 20_000)]
+        header = ebml(probe.EBML_HEADER, ebml(0x4282, b'webm'))
+        return header + ebml(probe.SEGMENT, *children, size=segment_size)
+
+    def test_matroska(self):
+        for segment_size in (None, (1 << 56) - 1):  # taille connue, puis inconnue
+            with self.subTest(segment_size=segment_size):
+                info = self.probe(self.mkv(segment_size))
+                self.assertAlmostEqual(info.duration, 12.5)
+                self.assertEqual((info.width, info.height), (1280, 720))
+                self.assertEqual((info.video_codec, info.audio_codec), ('V_VP9', 'A_OPUS'))
+
+    def test_matroska_truncated(self):
+        with self.assertRaises(probe.ProbeError):
+            self.probe(self.mkv()[:30])
+
+    def test_unknown_container(self):
+        with self.assertRaises(probe.ProbeError):
+            self.probe(b'RIFF\0\0\0\0AVI LIST' + b'\0' * 100)
+
+
+class FakeBucketClient:
+    """Client S3 minimal pour le ramasse-miettes : listes paginées, suppressions enregistrées."""
+
+    def __init__(self, objects=(), uploads=()):
+        self.objects = list(objects)
+        self.uploads = list(uploads)
+        self.delete_batches = []
+        self.aborted = []
+        self.upload_prefixes = []
+
+    def get_paginator(self, operation):
+        client = self
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix, PaginationConfig=None):
+                if operation == 'list_multipart_uploads':
+                    client.upload_prefixes.append(Prefix)
+                    yield {'Uploads': [upload for upload in client.uploads if upload['Key'].startswith(Prefix)]}
+                    return
+                matching = [obj for obj in client.objects if obj['Key'].startswith(Prefix)]
+                for start in range(0, len(matching), 1000):
+                    yield {'Contents': matching[start:start + 1000]}
+
+        return Paginator()
+
+    def delete_objects(self, Bucket, Delete):
+        self.delete_batches.append([obj['Key'] for obj in Delete['Objects']])
+        return {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted.append(UploadId)
+
+    @property
+    def deleted(self):
+        return {key for batch in self.delete_batches for key in batch}
+
+
+@override_settings(R2_CDN_DOMAIN='cdn.example.com', GC_PREFIXES=['videos/', 'covers/', 'derivatives/', 'hls/'])
+class StorageGCTests(TestCase):
+    """Ramasse-miettes du bucket (core.storage_gc, gc_storage)."""
+
+    old = timezone.now() - timedelta(days=30)
+
+    def s3_object(self, key, last_modified=None):
+        return {'Key': key, 'Size': 100, 'LastModified': last_modified or self.old}
+
+    def gc_storage(self, s3):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with mock.patch.object(storage_gc, 'get_s3_client', return_value=s3):
+            call_command('gc_storage', stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_referenced_keys_are_kept(self):
+        Video.objects.create(
+            title='Gardée',
+            video_file='https://cdn.example.com/videos/kept.mp4',
+            cover_image='https://cdn.example.com/covers/kept.jpg',
+            cover_derivatives={'webp': [[320, 'https://cdn.example.com/derivatives/covers/kept/320.webp']]},
+            hls_manifest='https://cdn.example.com/hls/1/v1/master.m3u8',
+        )
+        referenced = [
+            'videos/kept.mp4', 'covers/kept.jpg', 'derivatives/covers/kept/320.webp',
+            'hls/1/v1/master.m3u8', 'hls/1/v1/720p/index.m3u8', 'hls/1/v1/720p/segment_000.ts',
+        ]
+        orphans = ['videos/orphan.mp4', 'covers/orphan.jpg', 'hls/1/v0/720p/segment_000.ts']
+        recent = self.s3_object('videos/just-uploaded.mp4', timezone.now())
+        s3 = FakeBucketClient([self.s3_object(key) for key in referenced + orphans] + [recent])
+
+        self.gc_storage(s3)
+        self.assertEqual(s3.deleted, set(orphans))
+
+    def test_unmapped_reference_forces_dry_run(self):
+        Video.objects.create(title='Ailleurs', video_file='https://elsewhere.example.com/clip.mp4')
+        stale_upload = {'Key': 'videos/partial.mp4', 'UploadId': 'stale', 'Initiated': self.old}
+        s3 = FakeBucketClient([self.s3_object('videos/orphan.mp4')], [stale_upload])
+
+        stdout, stderr = self.gc_storage(s3)
+        self.assertEqual(s3.delete_batches, [])
+        self.assertEqual(s3.aborted, [])
+        self.assertIn('https://elsewhere.example.com/clip.mp4', stderr)
+        self.assertIn('Simulation', stdout)
+
+    def test_deletes_are_batched(self):
+        s3 = FakeBucketClient([self.s3_object(f'videos/orphan-{n}.mp4') for n in range(2500)])
+        self.gc_storage(s3)
+        self.assertEqual([len(batch) for batch in s3.delete_batches], [1000, 1000, 500])
+
+    def test_only_stale_uploads_are_aborted(self):
+        s3 = FakeBucketClient(uploads=[
+            {'Key': 'videos/abandoned.mp4', 'UploadId': 'stale', 'Initiated': self.old},
+            {'Key': 'videos/in-progress.mp4', 'UploadId': 'recent', 'Initiated': timezone.now()},
+            {'Key': 'backups/dump.sql', 'UploadId': 'unmanaged', 'Initiated': self.old},
+        ])
+        self.gc_storage(s3)
+        self.assertEqual(s3.aborted, ['stale'])
+        self.assertEqual(s3.upload_prefixes, settings.GC_PREFIXES)
+
+
+class BulkFinalizeTests(TestCase):
+    """bulk_create n'envoie pas post_save : BulkFinalizeUploadView passe par content_bulk_created."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('batcher')
+        cls.category = Category.objects.create(name='Voile', slug='voile')
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        # Index de suggestions propre à ce test, déjà construit
+        patcher = mock.patch.object(suggest, '_index', suggest.PrefixIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        suggest.get_index()
+
+    def test_finalize_creates_and_indexes(self):
+        self.assertEqual(homepage.get_snapshot()['videos'], [])
+        self.client.force_login(self.user)
+        items = [
+            {
+                'uploadType': 'video', 'title': 'Régate au large', 'category': self.category.pk,
+                'fileURL': 'https://cdn.example.com/videos/regate.mp4',
+                'cover_image': 'https://cdn.example.com/covers/regate.jpg',
+            },
+            {
+                'uploadType': 'photo', 'title': 'Ponton', 'category': 9999,
+                'fileURL': 'https://cdn.example.com/photos/ponton.jpg',
+            },
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('finalize_upload_bulk'), {'items': items}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (1, 1))
+        self.assertEqual(body['results'][1], {'index': 1, 'success': False, 'error': 'Catégorie inconnue'})
+        video = Video.objects.get(pk=body['results'][0]['id'])
+        self.assertFalse(Photo.objects.exists())
+
+        jobs_queued = set(Job.objects.values_list('name', 'payload__pk'))
+        self.assertEqual(jobs_queued, {('media.probe', video.pk), ('thumbnails.refresh', video.pk)})
+        self.assertEqual(list(search.search(Video.objects.all(), 'régate')), [video])
+        self.assertIn(('video', video.pk, 'Régate au large'), suggest.suggest('rega'))
+        # Instantané invalidé à la validation : la nouvelle vidéo apparaît
+        self.assertIsNone(cache.get(homepage.CACHE_KEY))
+        self.assertEqual(homepage.get_snapshot()['videos'], [video])
+
+
+class SuggestIndexTests(SimpleTestCase):
+    """Index de suggestions en mémoire (core.suggest)."""
+
+    def test_changes_during_rebuild_are_replayed(self):
+        index = suggest.PrefixIndex()
+        index.rebuild([('video', 1, 'Ancien titre'), ('video', 2, 'Supprimée')])
+
+        def snapshot():
+            # Lecture de la base, puis écritures d'autres requêtes avant la fin
+            yield 'video', 1, 'Ancien titre'
+            yield 'video', 2, 'Supprimée'
+            index.upsert('video', 1, 'Nouveau titre')
+            index.upsert('video', 3, 'Ajoutée')
+            index.remove('video', 2)
+
+        index.rebuild(snapshot())
+        self.assertEqual(index.lookup('nouveau'), [('video', 1, 'Nouveau titre')])
+        self.assertEqual(index.lookup('ancien'), [])
+        self.assertEqual(index.lookup('ajout'), [('video', 3, 'Ajoutée')])
+        self.assertEqual(index.lookup('supprim'), [])
+        self.assertFalse(index.rebuilding)
+
+
+class CachingTests(SimpleTestCase):
+    """Recalcul unique et valeur périmée servie pendant ce temps (core.caching.get_or_set)."""
+
+    key = 'tests:caching'
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.addCleanup(local_cache.clear)
+        self.addCleanup(cache.clear)
+
+    def test_stale_value_served_during_rebuild(self):
+        # Valeur expirée, encore dans le cache partagé (CACHE_STALE_GRACE)
+        cache.set(self.key, ('ancienne', time.time() - 1, 0.01), 300)
+        started, release = threading.Event(), threading.Event()
+
+        def slow_build():
+            started.set()
+            release.wait(5)
+            return 'nouvelle'
+
+        rebuilt = []
+        rebuilder = threading.Thread(target=lambda: rebuilt.append(caching.get_or_set(self.key, slow_build, 60)))
+        rebuilder.start()
+        self.addCleanup(rebuilder.join)
+        self.addCleanup(release.set)
+        self.assertTrue(started.wait(5))
+
+        # Un autre lecteur pendant le recalcul : l'ancienne valeur, sans second calcul
+        other_build = mock.Mock(return_value='doublon')
+        self.assertEqual(caching.get_or_set(self.key, other_build, 60), 'ancienne')
+        other_build.assert_not_called()
+
+        release.set()
+        rebuilder.join()
+        self.assertEqual(rebuilt, ['nouvelle'])
+        self.assertEqual(caching.get_or_set(self.key, other_build, 60), 'nouvelle')
+        other_build.assert_not_called()
+
+    def test_failed_build_releases_lock(self):
+        failing_build = mock.Mock(side_effect=RuntimeError('base indisponible'))
+        with self.assertRaises(RuntimeError):
+            caching.get_or_set(self.key, failing_build, 60)
+        self.assertIsNone(cache.get(f'{self.key}:lock'))
+
+        # Le lecteur suivant recalcule aussitôt, sans attendre CACHE_LOCK_TIMEOUT
+        with mock.patch.object(caching.time, 'sleep') as sleep:
+            self.assertEqual(caching.get_or_set(self.key, lambda: 'valeur', 60), 'valeur')
+        sleep.assert_not_called()
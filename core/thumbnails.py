@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Déclinaisons redimensionnées des couvertures de vidéos et des photos.
+
+Après un upload, l'image d'origine est lue une fois depuis R2 puis déclinée
+en plusieurs largeurs (THUMBNAIL_WIDTHS) et formats (THUMBNAIL_FORMATS,
+AVIF ignoré si Pillow ne le supporte pas). Les URLs sont enregistrées dans
+Video.cover_derivatives / Photo.photo_derivatives :
+
+    {"webp": [[320, "https://.../320.webp"], [640, ...]], "jpeg": [...]}
+
+et les templates en tirent des attributs srcset (filtre |srcset de media_cards).
+"""
+import io
+import posixpath
+
+from django.conf import settings
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+from .storage import get_s3_client, key_from_url, public_url
+
+# Format -> (format Pillow, extension, Content-Type, options d'encodage)
+FORMATS = {
+    'avif': ('AVIF', 'avif', 'image/avif', {'quality': 55}),
+    'webp': ('WEBP', 'webp', 'image/webp', {'quality': 75, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+# Champ source -> champ des déclinaisons, par modèle
+SOURCE_FIELDS = {
+    'video': ('cover_image', 'cover_derivatives'),
+    'photo': ('photo_file', 'photo_derivatives'),
+}
+
+
+def enabled_formats():
+    formats = []
+    for name in settings.THUMBNAIL_FORMATS:
+        if name == 'avif' and not features.check('avif'):
+            continue
+        if name in FORMATS:
+            formats.append(name)
+    return formats
+
+
+def _encode(image, fmt):
+    pil_format, _, _, options = FORMATS[fmt]
+    if fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def generate_derivatives(source_url):
+    """Crée et envoie sur R2 les déclinaisons de l'image `source_url`."""
+    key = key_from_url(source_url)
+    if not key:
+        return {}
+
+    s3 = get_s3_client()
+    body = s3.get_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)['Body']
+    with Image.open(io.BytesIO(body.read())) as source:
+        widths = sorted(w for w in settings.THUMBNAIL_WIDTHS if w < source.width)
+        if not widths:
+            return {}
+        # JPEG : décodage directement à une échelle réduite (1/2, 1/4, 1/8)
+        source.draft('RGB', (widths[-1], widths[-1] * source.height // source.width))
+        image = ImageOps.exif_transpose(source)
+        image.load()
+
+    stem = posixpath.splitext(key)[0]
+    derivatives = {fmt: [] for fmt in enabled_formats()}
+    # Du plus grand au plus petit : chaque réduction part de la précédente
+    for width in reversed(widths):
+        if image.width > width:
+            image = image.resize((width, max(1, image.height * width // image.width)), Image.LANCZOS)
+        for fmt in derivatives:
+            _, extension, content_type, _ = FORMATS[fmt]
+            derivative_key = f"derivatives/{stem}/{width}.{extension}"
+            s3.put_object(
+                Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+                Key=derivative_key,
+                Body=_encode(image, fmt),
+                ContentType=content_type,
+                CacheControl='public, max-age=31536000, immutable',
+            )
+            derivatives[fmt].append([width, public_url(derivative_key)])
+
+    for entries in derivatives.values():
+        entries.sort()
+    return derivatives
+
+
+def refresh_derivatives(obj):
+    """
+    (Re)génère les déclinaisons d'une vidéo (couverture) ou d'une photo.
+    Exécuté par la file de tâches (core.tasks) : les erreurs remontent pour
+    être retentées.
+
+    Renvoie les clés R2 des déclinaisons devenues inutiles (à supprimer) :
+    celles produites pour une image remplacée pendant le traitement.
+    """
+    source_field, derivatives_field = SOURCE_FIELDS[obj._meta.model_name]
+    source_url = getattr(obj, source_field)
+    derivatives = generate_derivatives(source_url)
+    with transaction.atomic():
+        # L'image a pu être remplacée pendant le traitement : on ne publie pas
+        current = (
+            type(obj).objects.select_for_update().filter(pk=obj.pk)
+            .values_list(source_field, flat=True).first()
+        )
+        if current != source_url:
+            return [key_from_url(url) for entries in derivatives.values() for _, url in entries]
+        setattr(obj, derivatives_field, derivatives)
+        obj.save(update_fields=[derivatives_field, 'updated_at'])
+    return []
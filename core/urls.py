@@ -29,7 +29,16 @@ administration_patterns = [
     # API (upload + presigned + finalize)
     path('api/upload/file/', views.upload_file, name='upload_file'),  # Server-side upload
     path('api/upload/presign/', views.S3PresignView.as_view(), name='s3_presign'),  # Direct R2 presigned
+    path('api/upload/presign/batch/', views.S3BatchPresignView.as_view(), name='s3_presign_batch'),  # Plusieurs fichiers, un aller-retour
     path('api/upload/finalize/', views.FinalizeUploadView.as_view(), name='finalize_upload'),  # Finalize metadata
+    path('api/upload/finalize/bulk/', views.BulkFinalizeUploadView.as_view(), name='finalize_upload_bulk'),  # Plusieurs fichiers, un INSERT
+
+    # Upload multipart présigné (routes Companion : companionUrl = .../api/upload)
+    path('api/upload/s3/multipart', views.MultipartCreateView.as_view(), name='multipart_create'),
+    path('api/upload/s3/multipart/<path:upload_id>/batch', views.MultipartSignPartsView.as_view(), name='multipart_sign_parts'),
+    path('api/upload/s3/multipart/<path:upload_id>/complete', views.MultipartCompleteView.as_view(), name='multipart_complete'),
+    path('api/upload/s3/multipart/<path:upload_id>/<int:part_number>', views.MultipartSignPartView.as_view(), name='multipart_sign_part'),
+    path('api/upload/s3/multipart/<path:upload_id>', views.MultipartUploadView.as_view(), name='multipart_upload'),
 
 ]
 
@@ -47,9 +56,11 @@ user_patterns = [
     path('photo/<int:photo_id>/comments/', views.get_photo_comments, name='get_photo_comments'),
 
     path('search/', views.search_results, name='search_results'),  
+    path('search/suggest/', views.search_suggest, name='search_suggest'),  # Autocomplétion
 
     path('video_user/', views.video_user, name='video_user'),
     path('photo_user/', views.photo_user, name='photo_user'),
+    path('api/feed/<str:kind>/', views.feed_api, name='feed_api'),  # Défilement infini (curseur)
 
     path("change-username/", views.change_username, name="change_username"),
 ]
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Compteur de vues bufferisé pour les vidéos.
+
+Les pages vidéo n'écrivent plus en base : chaque vue incrémente un compteur
+en mémoire du processus. Un thread de fond reporte périodiquement les
+deltas accumulés avec un UPDATE ... SET views = views + N (sans toucher
+updated_at), en regroupant les vidéos qui ont le même delta.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+_pending = Counter()
+_lock = threading.Lock()
+_flusher_pid = None
+
+
+def record_view(video_id):
+    """Enregistre une vue pour la vidéo `video_id` (aucune requête SQL)."""
+    if settings.VIEW_COUNT_FLUSH_INTERVAL <= 0:
+        # Buffer désactivé (tests, dev) : écriture immédiate
+        with _lock:
+            _pending[video_id] += 1
+        flush_views()
+        return
+    with _lock:
+        _pending[video_id] += 1
+    _ensure_flusher()
+
+
+def pending_views(video_id):
+    """Vues enregistrées par ce processus et pas encore reportées en base."""
+    return _pending.get(video_id, 0)
+
+
+def flush_views():
+    """Reporte en base les vues en attente ; renvoie le nombre de vidéos mises à jour."""
+    from .models import Video
+
+    with _lock:
+        if not _pending:
+            return 0
+        pending = dict(_pending)
+        _pending.clear()
+
+    by_delta = defaultdict(list)
+    for video_id, delta in pending.items():
+        by_delta[delta].append(video_id)
+
+    try:
+        with transaction.atomic():
+            for delta, video_ids in by_delta.items():
+                Video.objects.filter(id__in=video_ids).update(views=F('views') + delta)
+    except Exception:
+        logger.error("Échec du report des vues, nouvel essai au prochain cycle.", exc_info=True)
+        with _lock:
+            _pending.update(pending)
+        return 0
+    return len(pending)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(settings.VIEW_COUNT_FLUSH_INTERVAL)
+        try:
+            flush_views()
+        finally:
+            # Thread de fond : on ne garde pas de connexion ouverte entre deux cycles
+            connection.close()
+
+
+def _ensure_flusher():
+    # Un thread par processus (re-créé après un fork de gunicorn)
+    global _flusher_pid
+    pid = os.getpid()
+    if _flusher_pid == pid:
+        return
+    with _lock:
+        if _flusher_pid == pid:
+            return
+        _flusher_pid = pid
+        threading.Thread(target=_flush_loop, name='view-counter', daemon=True).start()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush_views()
+    except Exception:
+        logger.error("Vues perdues à l'arrêt du processus.", exc_info=True)
@@ -3,10 +3,6 @@ import json
 import logging
 import uuid
 import re
-import os
-import boto3
-from django.utils import timezone
-from botocore.config import Config
 from django.conf import settings
 from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
@@ -18,33 +14,61 @@ from django.views import View
 from django.core.files.uploadedfile import UploadedFile
 from django.contrib import messages
 from .forms import VideoForm, PhotoForm, PhotoEditForm, VideoEditForm
+from botocore.exceptions import ClientError
+from .storage import (
+    MAX_PARTS, get_presign_client, get_s3_client, part_size_for, public_root, public_url, stream_upload,
+)
+from .view_counter import record_view
+from .pagination import keyset_page, parse_page_size
+from . import homepage
+from .jobs import enqueue, enqueue_many
+from .signals import content_bulk_created
+from .tasks import media_keys
+from .thumbnails import SOURCE_FIELDS
 from .models import (
     Video, 
     Photo, 
     Category, 
-    Comment, 
-    Like, 
-    UserSubscription, 
-    SliderItem
+    PhotoComment,
+    PhotoLike,
+    VideoComment,
+    VideoLike,
 )
 from django.views.decorators.http import require_POST
+from django.db import transaction
 # import user
 from django.contrib.auth.models import User
 
 logger = logging.getLogger(__name__)
-from django.db.models import Q
-from django.db.models import Count
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from .search import search
+from .db_router import read_from_replica
+from .suggest import suggest
+from urllib.parse import quote
 from .models import Video, Photo
 
+SEARCH_PAGE_SIZE = 24
+
+
+def _search_page(queryset, page_number):
+    '''Page de résultats, vide si cette liste a moins de pages que l'autre'''
+    paginator = Paginator(queryset, SEARCH_PAGE_SIZE)
+    try:
+        return paginator.page(page_number or 1)
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return []
+
+@read_from_replica
 def search_results(request):
     query = request.GET.get('q', '').strip()
+    page_number = request.GET.get('page')
     videos = short_videos = photos = []
 
     if query:
-        # Recherche dans les vidéos
-        videos = Video.objects.filter(
-            Q(title__icontains=query) | Q(description__icontains=query)
-        ).distinct()
+        # Recherche dans les vidéos (plein texte, triée par pertinence)
+        videos = _search_page(search(Video.objects.for_feed(), query), page_number)
 
         # Tu n’as pas de champ `is_short` dans ton modèle Video,
         # donc pour distinguer "short videos", tu peux soit :
@@ -53,20 +77,10 @@ def search_results(request):
         short_videos = []  # ou une logique spécifique si tu veux les distinguer plus tard
 
         # Recherche dans les photos
-        photos = Photo.objects.filter(
-            Q(title__icontains=query) | Q(description__icontains=query)
-        ).distinct()
+        photos = _search_page(search(Photo.objects.for_feed(), query), page_number)
 
     # Vérifie l’abonnement pour le téléchargement
-    has_active_subscription = False
-    if request.user.is_authenticated:
-        from django.utils import timezone
-        from .models import UserSubscription
-        try:
-            sub = UserSubscription.objects.get(user=request.user, is_active=True)
-            has_active_subscription = sub.end_date > timezone.now()
-        except UserSubscription.DoesNotExist:
-            pass
+    has_active_subscription = request.entitlements.has_active_subscription
 
     return render(request, 'user/search_results.html', {
         'query': query,
@@ -77,6 +91,29 @@ def search_results(request):
     })
 
 
+SUGGEST_LIMIT = 10
+
+
+@read_from_replica
+def search_suggest(request):
+    '''Autocomplétion : titres et catégories commençant par ?q= (index en mémoire)'''
+    prefix = request.GET.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.GET.get('limit', SUGGEST_LIMIT)), 50))
+    except ValueError:
+        limit = SUGGEST_LIMIT
+
+    suggestions = []
+    for kind, obj_id, label in suggest(prefix, limit):
+        if kind == 'video':
+            url = reverse('video_player', args=[obj_id])
+        elif kind == 'photo':
+            url = reverse('photo_detail', args=[obj_id])
+        else:
+            url = f"{reverse('search_results')}?q={quote(label)}"
+        suggestions.append({'type': kind, 'id': obj_id, 'label': label, 'url': url})
+
+    return JsonResponse({'query': prefix, 'suggestions': suggestions})
 
 
 # =====================================================================
@@ -84,14 +121,15 @@ def search_results(request):
 # =====================================================================
 
 def home(request):
-    videos = Video.objects.all()[:6]
-    photos = Photo.objects.all()[:6]
-    return render(request, 'core/index.html', {'videos': videos, 'photos': photos})
+    snapshot = homepage.get_snapshot()
+    return render(request, 'core/index.html', {
+        'videos': snapshot['videos'][:6],
+        'photos': snapshot['photos'][:6],
+    })
 
 def video_detail(request, video_id):
     video = get_object_or_404(Video, id=video_id)
-    video.views += 1
-    video.save()
+    record_view(video.id)
     return render(request, 'core/video_detail.html', {'video': video})
 
 def photo_detail(request, photo_id):
@@ -140,31 +178,10 @@ def upload_file(request):
         key = "{}/{}".format(upload_type, unique_name)
 
         # Upload to R2
-        s3 = boto3.client(
-            's3',
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name='auto'
-        )
-
-        s3.put_object(
-            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
-            Key=key,
-            Body=uploaded_file.read(),
-            ContentType=uploaded_file.content_type or 'application/octet-stream'
-        )
+        stream_upload(get_s3_client(), uploaded_file, key, content_type=uploaded_file.content_type)
 
-        # Construct the public URL using CDN or fallback
-        cdn = getattr(settings, 'R2_CDN_DOMAIN', '') or os.getenv('R2_CDN_DOMAIN', '').strip()
-        if cdn and cdn.startswith("http"):
-            public_root = cdn.rstrip('/')
-        elif cdn:
-            public_root = f"https://{cdn.rstrip('/')}"
-        else:
-            public_root = f"{settings.AWS_S3_ENDPOINT_URL.rstrip('/')}/{settings.AWS_STORAGE_BUCKET_NAME}"
-        
-        file_url = f"{public_root}/{key}"
+        # Public URL (CDN or endpoint/bucket fallback)
+        file_url = public_url(key)
         
         return JsonResponse({
             'success': True,
@@ -180,6 +197,43 @@ def upload_file(request):
 # API VIEWS - PRESIGNED UPLOAD (DIRECT R2) - FALLBACK OPTION
 # =====================================================================
 
+def _new_upload_key(upload_type, filename):
+    upload_type = re.sub(r'[^a-zA-Z0-9_-]', '_', upload_type) or 'files'
+    safe = re.sub(r'[^a-zA-Z0-9._-]', '_', filename)
+    return f"{upload_type}/{uuid.uuid4().hex[:12]}_{safe}"
+
+
+# Taille maximale d'un fichier envoyé par POST présigné (au-delà : multipart)
+PRESIGNED_POST_MAX_SIZE = 2 * 1024**3
+# Nombre maximum de fichiers par appel à S3BatchPresignView
+PRESIGN_BATCH_MAX = 100
+
+
+def _presigned_post(key, content_type):
+    """POST présigné R2 pour `key` ; signature calculée localement, sans appel réseau."""
+    content_type = content_type or "application/octet-stream"
+    presigned = get_presign_client().generate_presigned_post(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+        Key=key,
+        Fields={
+            "Content-Type": content_type,
+            "key": key  # Include the key in the form fields as required by S3-compatible services
+        },
+        Conditions=[
+            {"Content-Type": content_type},
+            ["content-length-range", 1, PRESIGNED_POST_MAX_SIZE],  # 1 byte to 2GB
+            ["starts-with", "$key", key]  # The key should match exactly
+        ],
+        ExpiresIn=3600  # 1 hour
+    )
+    return {
+        'url': presigned['url'],  # Upload URL (R2 endpoint with bucket in path)
+        'fields': presigned['fields'],  # Form fields to include in POST
+        'method': 'POST',
+        'key': key,  # Key for this specific upload
+    }
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class S3PresignView(View):
     """Génère un presigned POST compatible R2 et retourne une public_url pour construire le lien final côté client."""
@@ -194,52 +248,9 @@ class S3PresignView(View):
             if not filename:
                 return JsonResponse({'error': 'Filename manquant'}, status=400)
 
-            # safe + unique filename
-            safe = re.sub(r'[^a-zA-Z0-9._-]', '_', filename)
-            unique = f"{uuid.uuid4().hex[:12]}_{safe}"
-            key = f"{upload_type}/{unique}"
-
-            s3 = boto3.client(
-                's3',
-                endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name='auto',
-                config=Config(signature_version='s3v4', s3={'addressing_style': 'path'})
-            )
-
-            # Generate presigned POST for R2 with explicit R2-compatible parameters
-            presigned = s3.generate_presigned_post(
-                Bucket=settings.AWS_STORAGE_BUCKET_NAME,
-                Key=key,
-                Fields={
-                    "Content-Type": content_type or "application/octet-stream",
-                    "key": key  # Include the key in the form fields as required by S3-compatible services
-                },
-                Conditions=[
-                    {"Content-Type": content_type or "application/octet-stream"},
-                    ["content-length-range", 1, 2 * 1024**3],  # 1 byte to 2GB
-                    ["starts-with", "$key", key]  # The key should match exactly
-                ],
-                ExpiresIn=3600  # 1 hour
-            )
-
-            # Construct the public URL using CDN if available (this is for accessing files after upload)
-            cdn = getattr(settings, 'R2_CDN_DOMAIN', '') or os.getenv('R2_CDN_DOMAIN', '').strip()
-            if cdn and cdn.startswith("http"):
-                public_root = cdn.rstrip('/')
-            elif cdn:
-                public_root = f"https://{cdn.rstrip('/')}"
-            else:
-                # Fallback - should use the CDN domain if available, otherwise use the endpoint with bucket
-                public_root = f"{settings.AWS_S3_ENDPOINT_URL.rstrip('/')}/{settings.AWS_STORAGE_BUCKET_NAME}"
-
             return JsonResponse({
-                'url': presigned['url'],  # Upload URL (R2 endpoint with bucket in path)
-                'fields': presigned['fields'],  # Form fields to include in POST
-                'method': 'POST',
-                'key': key,  # Key for this specific upload
-                'public_root': public_root,  # Base URL for public access after upload
+                **_presigned_post(_new_upload_key(upload_type, filename), content_type),
+                'public_root': public_root(),  # Base URL for public access after upload
                 'bucket_name': settings.AWS_STORAGE_BUCKET_NAME
             })
         except json.JSONDecodeError:
@@ -249,6 +260,217 @@ class S3PresignView(View):
             logger.error("Erreur presign: %s", e, exc_info=True)
             return JsonResponse({'error': str(e)}, status=500)
 
+
+@method_decorator(csrf_exempt, name='dispatch')
+class S3BatchPresignView(View):
+    """
+    Presigned POST pour plusieurs fichiers en une requête :
+    {"uploadType": "photos", "files": [{"filename": ..., "contentType": ...}, ...]}.
+    L'ordre des réponses suit celui des fichiers.
+    """
+    def post(self, request):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Not authenticated'}, status=401)
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Objet JSON attendu'}, status=400)
+
+        files = data.get('files')
+        if not isinstance(files, list) or not files:
+            return JsonResponse({'error': 'Liste de fichiers manquante'}, status=400)
+        if len(files) > PRESIGN_BATCH_MAX:
+            return JsonResponse({'error': f'{PRESIGN_BATCH_MAX} fichiers maximum par requête'}, status=400)
+
+        default_type = (data.get('uploadType') or 'photos').strip()
+        uploads = []
+        try:
+            for item in files:
+                filename = (item.get('filename') or '').strip() if isinstance(item, dict) else ''
+                if not filename:
+                    return JsonResponse({'error': 'Filename manquant'}, status=400)
+                key = _new_upload_key((item.get('uploadType') or default_type).strip(), filename)
+                uploads.append(_presigned_post(key, (item.get('contentType') or '').strip()))
+        except Exception as e:
+            logger.error("Erreur presign batch: %s", e, exc_info=True)
+            return JsonResponse({'error': str(e)}, status=500)
+
+        return JsonResponse({
+            'uploads': uploads,
+            'public_root': public_root(),
+            'bucket_name': settings.AWS_STORAGE_BUCKET_NAME,
+        })
+
+
+# =====================================================================
+# API VIEWS - PRESIGNED MULTIPART UPLOAD (DIRECT R2, GROS FICHIERS)
+# =====================================================================
+# Mêmes routes et réponses que Companion (/s3/multipart...) : le plugin
+# AwsS3 d'Uppy s'y branche avec companionUrl. Les octets vont directement
+# du navigateur à R2, part par part ; une part échouée est renvoyée seule
+# et listParts permet de reprendre un upload interrompu.
+
+# Clés générées par MultipartCreateView : "<type>/<12 hex>_<nom>"
+MULTIPART_KEY_RE = re.compile(r'^[a-zA-Z0-9_-]+/[0-9a-f]{12}_[a-zA-Z0-9._-]+$')
+# Nombre maximum d'URLs de parts signées par requête
+MULTIPART_SIGN_BATCH = 100
+
+
+class MultipartView(View):
+    """Base des vues multipart : authentification et clé de l'upload."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Not authenticated'}, status=401)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ClientError as e:
+            # NoSuchUpload, InvalidPart, ... : erreur du client, pas du serveur
+            logger.warning("Erreur multipart R2: %s", e)
+            return JsonResponse({'error': e.response.get('Error', {}).get('Message', str(e))}, status=400)
+        except Exception as e:
+            logger.error("Erreur multipart: %s", e, exc_info=True)
+            return JsonResponse({'error': str(e)}, status=500)
+
+    def get_key(self):
+        key = self.request.GET.get('key', '')
+        return key if MULTIPART_KEY_RE.match(key) else None
+
+    def presign_part(self, key, upload_id, part_number):
+        return get_presign_client().generate_presigned_url(
+            'upload_part',
+            Params={
+                'Bucket': settings.AWS_STORAGE_BUCKET_NAME,
+                'Key': key,
+                'UploadId': upload_id,
+                'PartNumber': part_number,
+            },
+            ExpiresIn=settings.R2_MULTIPART_URL_EXPIRY,
+        )
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class MultipartCreateView(MultipartView):
+    """Ouvre un upload multipart ; renvoie uploadId, key et la taille de part conseillée."""
+    def post(self, request):
+        try:
+            data = json.loads(request.body or "{}")
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        filename = (data.get('filename') or '').strip()
+        if not filename:
+            return JsonResponse({'error': 'Filename manquant'}, status=400)
+        content_type = (data.get('type') or data.get('contentType') or '').strip() or 'application/octet-stream'
+        upload_type = (data.get('uploadType') or (data.get('metadata') or {}).get('uploadType') or 'videos').strip()
+        try:
+            size = int(data.get('size') or 0)
+        except (TypeError, ValueError):
+            size = 0
+
+        key = _new_upload_key(upload_type, filename)
+        upload = get_s3_client().create_multipart_upload(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+            Key=key,
+            ContentType=content_type,
+        )
+        return JsonResponse({
+            'uploadId': upload['UploadId'],
+            'key': key,
+            # R2 exige des parts de taille identique (sauf la dernière)
+            'partSize': part_size_for(size),
+            'public_root': public_root(),
+        })
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class MultipartUploadView(MultipartView):
+    """GET : parts déjà envoyées (reprise) ; DELETE : abandon de l'upload."""
+    def get(self, request, upload_id):
+        key = self.get_key()
+        if not key:
+            return JsonResponse({'error': 'Clé invalide'}, status=400)
+        paginator = get_s3_client().get_paginator('list_parts')
+        parts = []
+        for page in paginator.paginate(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key, UploadId=upload_id):
+            parts += [
+                {'PartNumber': part['PartNumber'], 'Size': part['Size'], 'ETag': part['ETag']}
+                for part in page.get('Parts', [])
+            ]
+        return JsonResponse(parts, safe=False)
+
+    def delete(self, request, upload_id):
+        key = self.get_key()
+        if not key:
+            return JsonResponse({'error': 'Clé invalide'}, status=400)
+        get_s3_client().abort_multipart_upload(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key, UploadId=upload_id,
+        )
+        return JsonResponse({})
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class MultipartSignPartsView(MultipartView):
+    """URLs présignées d'un lot de parts (?partNumbers=1,2,3)."""
+    def get(self, request, upload_id):
+        key = self.get_key()
+        if not key:
+            return JsonResponse({'error': 'Clé invalide'}, status=400)
+        try:
+            numbers = sorted({int(n) for n in request.GET.get('partNumbers', '').split(',') if n.strip()})
+        except ValueError:
+            return JsonResponse({'error': 'partNumbers invalide'}, status=400)
+        if not numbers or len(numbers) > MULTIPART_SIGN_BATCH or not 1 <= numbers[0] <= numbers[-1] <= MAX_PARTS:
+            return JsonResponse({'error': f'Entre 1 et {MULTIPART_SIGN_BATCH} parts numérotées de 1 à {MAX_PARTS}'}, status=400)
+        # Signatures calculées localement : aucun appel réseau
+        return JsonResponse({
+            'presignedUrls': {number: self.presign_part(key, upload_id, number) for number in numbers},
+        })
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class MultipartSignPartView(MultipartView):
+    """URL présignée d'une seule part (signPart d'Uppy)."""
+    def get(self, request, upload_id, part_number):
+        key = self.get_key()
+        if not key:
+            return JsonResponse({'error': 'Clé invalide'}, status=400)
+        if not 1 <= part_number <= MAX_PARTS:
+            return JsonResponse({'error': 'Numéro de part invalide'}, status=400)
+        return JsonResponse({
+            'url': self.presign_part(key, upload_id, part_number),
+            'expires': settings.R2_MULTIPART_URL_EXPIRY,
+        })
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class MultipartCompleteView(MultipartView):
+    """Assemble les parts ; renvoie l'URL publique à passer ensuite à finalize."""
+    def post(self, request, upload_id):
+        key = self.get_key()
+        if not key:
+            return JsonResponse({'error': 'Clé invalide'}, status=400)
+        try:
+            data = json.loads(request.body or "{}")
+            parts = sorted(
+                ({'PartNumber': int(part['PartNumber']), 'ETag': part['ETag']} for part in data.get('parts', [])),
+                key=lambda part: part['PartNumber'],
+            )
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+            return JsonResponse({'error': 'Liste de parts invalide'}, status=400)
+        if not parts:
+            return JsonResponse({'error': 'Aucune part'}, status=400)
+
+        get_s3_client().complete_multipart_upload(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts},
+        )
+        return JsonResponse({'location': public_url(key), 'key': key})
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class FinalizeUploadView(View):
     """Sauvegarde métadonnées (fileURL attendu public)"""
@@ -269,24 +491,32 @@ class FinalizeUploadView(View):
                 return JsonResponse({'error': 'URL ou titre manquant'}, status=400)
 
             if upload_type == 'video':
-                video = Video.objects.create(
-                    user=request.user,
-                    title=title,
-                    description=description,
-                    video_file=file_url,
-                    cover_image=cover_image,
-                    duration=int(duration) if duration else 0,
-                    category_id=category_id if category_id else None,
-                )
+                with transaction.atomic():
+                    video = Video.objects.create(
+                        user=request.user,
+                        title=title,
+                        description=description,
+                        video_file=file_url,
+                        cover_image=cover_image,
+                        duration=int(duration) if duration else 0,
+                        category_id=category_id if category_id else None,
+                    )
+                    # Traitements lourds hors requête (cf. core.tasks)
+                    if video.video_file:
+                        enqueue('media.probe', pk=video.id)
+                    if video.cover_image:
+                        enqueue('thumbnails.refresh', model='video', pk=video.id)
                 return JsonResponse({'success': True, 'id': video.id, 'url': f'/administration/video/{video.id}/', 'message': 'Vidéo publiée'})
             elif upload_type == 'photo':
-                photo = Photo.objects.create(
-                    user=request.user,
-                    title=title,
-                    description=description,
-                    photo_file=file_url,
-                    category_id=category_id if category_id else None,
-                )
+                with transaction.atomic():
+                    photo = Photo.objects.create(
+                        user=request.user,
+                        title=title,
+                        description=description,
+                        photo_file=file_url,
+                        category_id=category_id if category_id else None,
+                    )
+                    enqueue('thumbnails.refresh', model='photo', pk=photo.id)
                 return JsonResponse({'success': True, 'id': photo.id, 'url': f'/administration/photo/{photo.id}/', 'message': 'Photo publiée'})
 
             return JsonResponse({'error': 'Type invalide'}, status=400)
@@ -295,6 +525,124 @@ class FinalizeUploadView(View):
             return JsonResponse({'error': str(e)}, status=500)
 
 
+# Nombre maximum d'éléments par appel à BulkFinalizeUploadView
+BULK_FINALIZE_MAX = 500
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class BulkFinalizeUploadView(View):
+    """
+    Finalise plusieurs uploads en une requête :
+    {"uploadType": "photo", "items": [{"fileURL": ..., "title": ..., "category": ...}, ...]}.
+
+    Tous les éléments sont validés ensemble (catégories vérifiées en une
+    requête), les éléments valides sont insérés par bulk_create dans une
+    seule transaction et la réponse donne un résultat par élément, dans
+    l'ordre reçu.
+    """
+    def post(self, request):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Non authentifié'}, status=401)
+        try:
+            data = json.loads(request.body or "{}")
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+        items = data.get('items')
+        if not isinstance(items, list) or not items:
+            return JsonResponse({'error': 'Liste d\'éléments manquante'}, status=400)
+        if len(items) > BULK_FINALIZE_MAX:
+            return JsonResponse({'error': f'{BULK_FINALIZE_MAX} éléments maximum par requête'}, status=400)
+        default_type = data.get('uploadType', 'photo')
+
+        try:
+            results, pending = self.validate(items, default_type, request.user)
+            with transaction.atomic():
+                for model, entries in pending.items():
+                    if entries:
+                        self.create(model, entries, results)
+        except Exception as e:
+            logger.error("Erreur finalisation groupée: %s", e, exc_info=True)
+            return JsonResponse({'error': str(e)}, status=500)
+
+        created = sum(1 for result in results if result['success'])
+        return JsonResponse({
+            'success': created == len(results),
+            'created': created,
+            'failed': len(results) - created,
+            'results': results,
+        })
+
+    def validate(self, items, default_type, user):
+        """Résultats initiaux (erreurs) et objets à créer, par modèle."""
+        category_ids = set()
+        for item in items:
+            category_id = item.get('category') if isinstance(item, dict) else None
+            if category_id and str(category_id).isdigit():
+                category_ids.add(int(category_id))
+        categories = Category.objects.in_bulk(category_ids)
+
+        results = []
+        pending = {Video: [], Photo: []}
+        for index, item in enumerate(items):
+            result = {'index': index, 'success': False}
+            results.append(result)
+            if not isinstance(item, dict):
+                result['error'] = 'Élément invalide'
+                continue
+
+            upload_type = item.get('uploadType', default_type)
+            file_url = item.get('fileURL')
+            title = (item.get('title') or '').strip()
+            category_id = item.get('category')
+            if upload_type not in ('video', 'photo'):
+                result['error'] = 'Type invalide'
+                continue
+            if not file_url or not title:
+                result['error'] = 'URL ou titre manquant'
+                continue
+            category = None
+            if category_id:
+                category = categories.get(int(category_id)) if str(category_id).isdigit() else None
+                if category is None:
+                    result['error'] = 'Catégorie inconnue'
+                    continue
+
+            fields = {
+                'user': user,
+                'title': title,
+                'description': (item.get('description') or '').strip(),
+                'category': category,
+            }
+            if upload_type == 'video':
+                try:
+                    duration = int(item.get('duration') or 0)
+                except (TypeError, ValueError):
+                    result['error'] = 'La durée doit être un nombre entier.'
+                    continue
+                pending[Video].append((result, Video(
+                    video_file=file_url, cover_image=item.get('cover_image') or None, duration=duration, **fields
+                )))
+            else:
+                pending[Photo].append((result, Photo(photo_file=file_url, **fields)))
+        return results, pending
+
+    def create(self, model, entries, results):
+        objs = model.objects.bulk_create([obj for _, obj in entries])
+        # bulk_create ne déclenche pas post_save (cf. core.signals)
+        content_bulk_created(model, objs)
+
+        kind = model.__name__.lower()
+        if model is Video:
+            enqueue_many('media.probe', [{'pk': obj.pk} for obj in objs])
+            enqueue_many('thumbnails.refresh', [{'model': kind, 'pk': obj.pk} for obj in objs if obj.cover_image])
+        else:
+            enqueue_many('thumbnails.refresh', [{'model': kind, 'pk': obj.pk} for obj in objs])
+
+        for (result, _), obj in zip(entries, objs):
+            result.update(success=True, id=obj.pk, url=f'/administration/{kind}/{obj.pk}/')
+
+
 # =====================================================================
 # VUES MODIFICATION ET SUPPRESSION
 # =====================================================================
@@ -323,15 +671,26 @@ def edit_video(request, video_id):
             video_file_url = request.POST.get('video_file_url')
             
             # Mettre à jour les champs avec les nouvelles URLs si elles sont fournies
+            changed = []
             if cover_image_url:
                 video.cover_image = cover_image_url
+                video.cover_derivatives = {}  # les anciennes miniatures ne correspondent plus
+                changed += ['cover_image', 'cover_derivatives']
                 print(f"Nouvelle URL de couverture: {cover_image_url}")  # Debug
             if video_file_url:
                 video.video_file = video_file_url
+                video.hls_manifest = ''  # l'ancien packaging HLS ne correspond plus
+                changed += ['video_file', 'hls_manifest']
                 print(f"Nouvelle URL de vidéo: {video_file_url}")  # Debug
                 
-            # Sauvegarder les modifications
-            video.save()
+            # Sauvegarder les modifications (seulement les champs modifiés :
+            # les compteurs ont pu changer depuis le chargement de la vidéo)
+            with transaction.atomic():
+                video.save(update_fields=[*changed, 'updated_at'])
+                if cover_image_url:
+                    enqueue('thumbnails.refresh', model='video', pk=video.id)
+                if video_file_url:
+                    enqueue('media.probe', pk=video.id)
             
             messages.success(request, "Vidéo mise à jour avec succès !")
             return redirect('video_detail', video_id=video_id)
@@ -423,13 +782,19 @@ def delete_photo(request, photo_id):
 
 @login_required
 def user_content(request):
-    '''Vue pour afficher le contenu de l'utilisateur'''
-    videos = Video.objects.filter(user=request.user).order_by('-created_at')
-    photos = Photo.objects.filter(user=request.user).order_by('-created_at')
+    '''Vue pour afficher le contenu de l'utilisateur (paginé par curseur)'''
+    videos = Video.objects.filter(user=request.user)
+    photos = Photo.objects.filter(user=request.user)
+    video_page = keyset_page(videos.for_feed(), request.GET.get('videos_cursor'))
+    photo_page = keyset_page(photos.for_feed(), request.GET.get('photos_cursor'))
     
     return render(request, 'core/user_content.html', {
-        'videos': videos,
-        'photos': photos
+        'videos': video_page.items,
+        'photos': photo_page.items,
+        'videos_total': videos.count(),
+        'photos_total': photos.count(),
+        'videos_next_cursor': video_page.next_cursor,
+        'photos_next_cursor': photo_page.next_cursor,
     })
 
 
@@ -463,12 +828,22 @@ class UpdateVideoAPIView(View):
                 video.category = None
             
             # Mettre à jour les URLs si fournies
+            changed = ['title', 'description', 'duration', 'category']
             if 'new_video_url' in data and data['new_video_url']:
                 video.video_file = data['new_video_url']
+                video.hls_manifest = ''  # l'ancien packaging HLS ne correspond plus
+                changed += ['video_file', 'hls_manifest']
             if 'new_cover_url' in data and data['new_cover_url']:
                 video.cover_image = data['new_cover_url']
+                video.cover_derivatives = {}  # les anciennes miniatures ne correspondent plus
+                changed += ['cover_image', 'cover_derivatives']
                 
-            video.save()
+            with transaction.atomic():
+                video.save(update_fields=[*changed, 'updated_at'])
+                if data.get('new_cover_url'):
+                    enqueue('thumbnails.refresh', model='video', pk=video.id)
+                if data.get('new_video_url'):
+                    enqueue('media.probe', pk=video.id)
             
             return JsonResponse({
                 'success': True,
@@ -505,10 +880,16 @@ class UpdatePhotoAPIView(View):
                 photo.category = None
                 
             # Mettre à jour l'URL de la photo si fournie
+            changed = ['title', 'description', 'category']
             if 'new_photo_url' in data and data['new_photo_url']:
                 photo.photo_file = data['new_photo_url']
+                photo.photo_derivatives = {}  # les anciennes miniatures ne correspondent plus
+                changed += ['photo_file', 'photo_derivatives']
                 
-            photo.save()
+            with transaction.atomic():
+                photo.save(update_fields=[*changed, 'updated_at'])
+                if data.get('new_photo_url'):
+                    enqueue('thumbnails.refresh', model='photo', pk=photo.id)
             
             return JsonResponse({
                 'success': True,
@@ -564,51 +945,60 @@ class ReplaceMediaView(View):
                 # Utiliser media_type pour organiser les dossiers dans R2 (ex: covers/, videos/)
                 unique_filename = f"{media_type}s/{uuid.uuid4().hex[:12]}_{safe_name}"
 
-                # Initialisation du client S3 (compatible R2)
-                s3_client = boto3.client(
-                    's3',
-                    endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                    region_name='auto'
-                )
-
-                # Upload direct du fichier sur R2 avec ACL publique
-                s3_client.put_object(
-                    Bucket=settings.AWS_STORAGE_BUCKET_NAME,
-                    Key=unique_filename,
-                    Body=uploaded_file.read(),
-                    ContentType=uploaded_file.content_type or 'application/octet-stream',
+                # Upload en streaming du fichier sur R2 avec ACL publique
+                stream_upload(
+                    get_s3_client(),
+                    uploaded_file,
+                    unique_filename,
+                    content_type=uploaded_file.content_type,
                     ACL='public-read'  # Rendre l'objet public
                 )
 
-                # Construction de l'URL publique pour accéder au fichier
-                # CORRECTION : Utiliser correctement le domaine CDN
-                cdn_domain = getattr(settings, 'R2_CDN_DOMAIN', '').strip()
-                if cdn_domain:
-                    # Utiliser le domaine CDN personnalisé s'il existe
-                    public_root = f"https://{cdn_domain.rstrip('/')}"
-                else:
-                    # Sinon, utiliser l'endpoint R2 direct (moins performant)
-                    public_root = f"{settings.AWS_S3_ENDPOINT_URL.rstrip('/')}/{settings.AWS_STORAGE_BUCKET_NAME}"
-                
-                new_media_url = f"{public_root}/{unique_filename}"
+                # Construction de l'URL publique pour accéder au fichier (domaine CDN s'il existe)
+                new_media_url = public_url(unique_filename)
                 
                 # Debug
-                print(f"CDN Domain: {cdn_domain}")
-                print(f"Public Root: {public_root}")
                 print(f"Generated URL: {new_media_url}")
 
-                # Mise à jour du champ correspondant dans l'objet
+                # Champ à mettre à jour dans l'objet
+                field = None
                 if object_type == 'video':
                     if media_type == 'cover':
-                        obj.cover_image = new_media_url
+                        field = 'cover_image'
                     elif media_type == 'video_file':
-                        obj.video_file = new_media_url
+                        field = 'video_file'
                 elif object_type == 'photo':
-                    obj.photo_file = new_media_url
-                
-                obj.save()
+                    field = 'photo_file'
+
+                # obj a été chargé avant l'upload : seuls les champs modifiés
+                # sont écrits, pas les compteurs mis à jour entre-temps
+                changed = []
+                with transaction.atomic():
+                    if field:
+                        # L'ancien fichier (et ses miniatures) sera supprimé de R2 en arrière-plan,
+                        # une fois expirés les caches qui peuvent encore servir son URL
+                        old_keys = media_keys(obj, field)
+                        setattr(obj, field, new_media_url)
+                        changed.append(field)
+                        if field in ('cover_image', 'photo_file'):
+                            # Les anciennes miniatures ne correspondent plus
+                            setattr(obj, SOURCE_FIELDS[object_type][1], {})
+                            changed.append(SOURCE_FIELDS[object_type][1])
+                        elif field == 'video_file':
+                            # Ni l'ancien packaging HLS
+                            obj.hls_manifest = ''
+                            changed.append('hls_manifest')
+                        if old_keys:
+                            enqueue(
+                                'storage.delete_objects', delay=settings.REPLACED_MEDIA_DELETE_DELAY, keys=old_keys,
+                            )
+                    obj.save(update_fields=[*changed, 'updated_at'])
+
+                    # Nouvelles miniatures pour une nouvelle couverture / photo
+                    if field in ('cover_image', 'photo_file'):
+                        enqueue('thumbnails.refresh', model=object_type, pk=obj.id)
+                    elif field == 'video_file':
+                        enqueue('media.probe', pk=obj.id)
 
                 return JsonResponse({
                     'success': True,
@@ -619,6 +1009,7 @@ class ReplaceMediaView(View):
             # --- 4. Gestion de la mise à jour des métadonnées (si aucun fichier) ---
             
             else:
+                changed = []
                 # Mise à jour des champs texte pour une vidéo
                 if object_type == 'video':
                     title = request.POST.get('title')
@@ -628,15 +1019,19 @@ class ReplaceMediaView(View):
                     
                     if title is not None:
                         obj.title = title
+                        changed.append('title')
                     if description is not None:
                         obj.description = description
+                        changed.append('description')
                     if duration_val:
                         try:
                             obj.duration = int(duration_val)
                         except ValueError:
                             return JsonResponse({'error': 'La durée doit être un nombre entier.'}, status=400)
+                        changed.append('duration')
                     if category_id:
                         obj.category_id = category_id
+                        changed.append('category')
 
                 # Mise à jour des champs texte pour une photo
                 elif object_type == 'photo':
@@ -646,12 +1041,15 @@ class ReplaceMediaView(View):
                     
                     if title is not None:
                         obj.title = title
+                        changed.append('title')
                     if description is not None:
                         obj.description = description
+                        changed.append('description')
                     if category_id:
                         obj.category_id = category_id
+                        changed.append('category')
 
-                obj.save()
+                obj.save(update_fields=[*changed, 'updated_at'])
 
                 return JsonResponse({
                     'success': True,
@@ -676,41 +1074,16 @@ class ReplaceMediaView(View):
 # views.py
 
 
+@read_from_replica
 def index(request):
-    videos = Video.objects.all()[:6]
-    photos = Photo.objects.all().annotate(comment_count=Count('comment'))[:12]
-    slider_items = SliderItem.objects.select_related('video').all()
-    slides = []
-    for item in slider_items:
-        if item.video and item.video.cover_image:
-            image_url = item.video.cover_image
-            if not image_url.startswith('http'):
-                image_url = request.build_absolute_uri(image_url)
-            slides.append({
-                'image': image_url,
-                'text': item.video.title,
-                'video_id': item.video.id
-            })
-    if not slides and videos:
-        for video in videos[:5]:
-            if video.cover_image:
-                image_url = video.cover_image
-                if not image_url.startswith('http'):
-                    image_url = request.build_absolute_uri(image_url)
-                slides.append({
-                    'image': image_url,
-                    'text': video.title,
-                    'video_id': video.id
-                })
+    # Vidéos, photos et slides partagés par tous les visiteurs (cf. core.homepage)
+    snapshot = homepage.get_snapshot()
+    videos = snapshot['videos']
+    photos = snapshot['photos']
+    slides = homepage.absolute_slides(request, snapshot['slides'])
 
-    # 🔴 Ajout : vérification de l'abonnement
-    has_active_subscription = False
-    if request.user.is_authenticated:
-        try:
-            subscription = UserSubscription.objects.get(user=request.user, is_active=True)
-            has_active_subscription = subscription.end_date > timezone.now()
-        except UserSubscription.DoesNotExist:
-            pass
+    # 🔴 Ajout : vérification de l'abonnement (en cache, cf. core.entitlements)
+    has_active_subscription = request.entitlements.has_active_subscription
 
     return render(request, 'user/index.html', {
         'videos': videos,
@@ -724,31 +1097,24 @@ def index(request):
 @login_required
 def video_player(request, pk):
     """Affiche une page avec un lecteur vidéo pour une vidéo spécifique."""
-    video = get_object_or_404(Video, id=pk)
+    video = get_object_or_404(Video.objects.for_feed(), id=pk)
     
-    # Incrémenter le nombre de vues
-    video.views += 1
-    video.save()
+    # Incrémenter le nombre de vues (bufferisé, reporté en base en arrière-plan)
+    record_view(video.id)
     
     # Récupérer les vidéos similaires (même catégorie)
-    similar_videos = Video.objects.filter(category=video.category).exclude(id=video.id)[:4]
+    similar_videos = Video.objects.for_feed().filter(category=video.category).exclude(id=video.id)[:4]
     
     # Récupérer les commentaires de la vidéo
-    comments = Comment.objects.filter(video=video).order_by('-created_at')
+    comments = VideoComment.objects.for_display().filter(video=video)
     
     # Vérifier si l'utilisateur a aimé cette vidéo
     is_favorite = False
     if request.user.is_authenticated:
-        is_favorite = Like.objects.filter(user=request.user, video=video).exists()
+        is_favorite = VideoLike.objects.filter(user=request.user, video=video).exists()
     
     # Vérifier si l'utilisateur a un abonnement actif
-    has_active_subscription = False
-    if request.user.is_authenticated:
-        try:
-            subscription = UserSubscription.objects.get(user=request.user, is_active=True)
-            has_active_subscription = subscription.end_date > timezone.now()
-        except UserSubscription.DoesNotExist:
-            has_active_subscription = False
+    has_active_subscription = request.entitlements.has_active_subscription
     
     return render(request, 'user/video_player.html', {
         'video': video,
@@ -766,13 +1132,15 @@ def video_player(request, pk):
 @login_required
 def toggle_video_like(request, video_id):
     user = request.user
-    like, created = Like.objects.get_or_create(user=user, video_id=video_id, photo_id__isnull=True)
-    if not created:
-        like.delete()
-        is_liked = False
-    else:
-        is_liked = True
-    count = Like.objects.filter(video_id=video_id).count()
+    with transaction.atomic():
+        like, created = VideoLike.objects.get_or_create(user=user, video_id=video_id)
+        if not created:
+            like.delete()
+            is_liked = False
+        else:
+            is_liked = True
+    # Compteur dénormalisé maintenu par core.signals
+    count = Video.objects.filter(id=video_id).values_list('like_count', flat=True).first() or 0
     return JsonResponse({'success': True, 'is_liked': is_liked, 'likes_count': count})
 
 def get_photo_like_status(request, photo_id):
@@ -781,8 +1149,8 @@ def get_photo_like_status(request, photo_id):
         return JsonResponse({'is_liked': False, 'likes_count': 0})
     
     user = request.user
-    is_liked = Like.objects.filter(user=user, photo_id=photo_id).exists()
-    likes_count = Like.objects.filter(photo_id=photo_id).count()
+    is_liked = PhotoLike.objects.filter(user=user, photo_id=photo_id).exists()
+    likes_count = Photo.objects.filter(id=photo_id).values_list('like_count', flat=True).first() or 0
     
     return JsonResponse({'is_liked': is_liked, 'likes_count': likes_count})
 
@@ -791,16 +1159,18 @@ def get_photo_like_status(request, photo_id):
 def toggle_photo_like(request, photo_id):
     user = request.user
     # Check if user already liked this photo
-    try:
-        like = Like.objects.get(user=user, photo_id=photo_id)
-        # If like exists, delete it (unlike)
-        like.delete()
-        is_liked = False
-    except Like.DoesNotExist:
-        # If like doesn't exist, create it (like)
-        Like.objects.create(user=user, photo_id=photo_id, video_id=None)
-        is_liked = True
-    count = Like.objects.filter(photo_id=photo_id).count()
+    with transaction.atomic():
+        try:
+            like = PhotoLike.objects.get(user=user, photo_id=photo_id)
+            # If like exists, delete it (unlike)
+            like.delete()
+            is_liked = False
+        except PhotoLike.DoesNotExist:
+            # If like doesn't exist, create it (like)
+            PhotoLike.objects.create(user=user, photo_id=photo_id)
+            is_liked = True
+    # Compteur dénormalisé maintenu par core.signals
+    count = Photo.objects.filter(id=photo_id).values_list('like_count', flat=True).first() or 0
     return JsonResponse({'success': True, 'is_liked': is_liked, 'likes_count': count})
 
 
@@ -813,7 +1183,8 @@ def add_video_comment(request, video_id):
     if not text:
         return JsonResponse({'success': False, 'error': 'Commentaire vide'})
 
-    comment = Comment.objects.create(user=user, video_id=video_id, text=text)
+    with transaction.atomic():
+        comment = VideoComment.objects.create(user=user, video_id=video_id, text=text)
 
     return JsonResponse({
         'success': True,
@@ -834,7 +1205,8 @@ def add_photo_comment(request, photo_id):
     if not text:
         return JsonResponse({'success': False, 'error': 'Commentaire vide'})
 
-    comment = Comment.objects.create(user=user, photo_id=photo_id, text=text)
+    with transaction.atomic():
+        comment = PhotoComment.objects.create(user=user, photo_id=photo_id, text=text)
 
     return JsonResponse({
         'success': True,
@@ -847,22 +1219,87 @@ def add_photo_comment(request, photo_id):
     })
 
 
+@read_from_replica
 def video_user(request):
-    videos = Video.objects.all()
+    page = keyset_page(Video.objects.for_feed(), request.GET.get('cursor'))
     categories = Category.objects.all()
 
-    return render(request, 'user/video_alll.html', {'videos': videos, 'categories': categories})
+    return render(request, 'user/video_alll.html', {
+        'videos': page.items,
+        'next_cursor': page.next_cursor,
+        'categories': categories,
+    })
 
+@read_from_replica
 def photo_user(request):
-    photos = Photo.objects.all().annotate(comment_count=Count('comment'))
+    page = keyset_page(Photo.objects.for_feed(), request.GET.get('cursor'))
     categories = Category.objects.all()
     
-    return render(request, 'user/photo.html', {'photos': photos, 'categories': categories})
+    return render(request, 'user/photo.html', {
+        'photos': page.items,
+        'next_cursor': page.next_cursor,
+        'categories': categories,
+    })
+
+
+def _serialize_video(video):
+    return {
+        'id': video.id,
+        'title': video.title,
+        'cover_url': video.cover_url,
+        'duration': video.duration,
+        'views': video.views,
+        'like_count': video.like_count,
+        'comment_count': video.comment_count,
+        'created_at': video.created_at.isoformat(),
+        'url': reverse('video_player', args=[video.id]),
+    }
+
+
+def _serialize_photo(photo):
+    return {
+        'id': photo.id,
+        'title': photo.title,
+        'image_url': photo.image_url,
+        'like_count': photo.like_count,
+        'comment_count': photo.comment_count,
+        'created_at': photo.created_at.isoformat(),
+    }
+
+
+@read_from_replica
+def feed_api(request, kind):
+    '''
+    Flux JSON paginé par curseur pour le défilement infini.
+    GET ?cursor=<next_cursor>&limit=<n>&mine=1 (contenu de l'utilisateur connecté)
+    '''
+    if kind == 'videos':
+        queryset, serialize = Video.objects.for_feed(), _serialize_video
+    elif kind == 'photos':
+        queryset, serialize = Photo.objects.for_feed(), _serialize_photo
+    else:
+        return JsonResponse({'error': 'Type invalide'}, status=400)
+
+    if request.GET.get('mine'):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Non authentifié'}, status=401)
+        queryset = queryset.filter(user=request.user)
+
+    page = keyset_page(
+        queryset,
+        request.GET.get('cursor'),
+        parse_page_size(request.GET.get('limit')),
+    )
+    return JsonResponse({
+        'results': [serialize(obj) for obj in page.items],
+        'next_cursor': page.next_cursor,
+    })
 
 
+@read_from_replica
 def get_photo_comments(request, photo_id):
     photo = get_object_or_404(Photo, id=photo_id)
-    comments = Comment.objects.filter(photo=photo).order_by('-created_at').select_related('user')
+    comments = PhotoComment.objects.for_display().filter(photo=photo)
     
     comments_data = [{
         'id': c.id,
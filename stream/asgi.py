@@ -3,5 +3,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stream.settings')
+# Sous ASGI (core.async_views), les connexions passent par un pool psycopg
+os.environ.setdefault('DB_CONNECTION_MODE', 'pool')
 
 application = get_asgi_application()
@@ -1,6 +1,11 @@
 """
 Custom middleware to handle proxy headers correctly
 """
+from django.utils.functional import SimpleLazyObject
+
+from core import db_router
+from core.entitlements import Entitlements
+
 class ProxyHeaderMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -9,4 +14,30 @@ class ProxyHeaderMiddleware:
         # Handle headers from Render proxy
         if request.META.get('HTTP_X_FORWARDED_PROTO') == 'https':
             request.META['wsgi.url_scheme'] = 'https'
-        return self.get_response(request)
\ No newline at end of file
+        return self.get_response(request)
+
+
+class EntitlementMiddleware:
+    """Expose request.entitlements (abonnement en cache, évalué à la demande)."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.entitlements = SimpleLazyObject(lambda: Entitlements(request.user))
+        return self.get_response(request)
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Routage des lectures (core.db_router) : garde sur la base principale,
+    quelques secondes, le visiteur qui vient d'écrire.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with db_router.request_scope(primary=db_router.is_sticky(request)) as state:
+            response = self.get_response(request)
+        if state.wrote or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            db_router.make_sticky(response)
+        return response
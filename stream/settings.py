@@ -50,6 +50,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # Recherche plein texte (core.search)
 
     "widget_tweaks",
 
@@ -70,6 +71,7 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # Doit être en premier pour gérer les CORS
     'stream.middleware.ProxyHeaderMiddleware',  # Add this for Render proxy headers
     'django.middleware.security.SecurityMiddleware',
+    'stream.middleware.ReplicaStickinessMiddleware',  # Lectures sur réplica (core.db_router)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -77,6 +79,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',  # Déplacé ici
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     "allauth.account.middleware.AccountMiddleware",
+    'stream.middleware.EntitlementMiddleware',  # request.entitlements (abonnement en cache)
 ] 
 
 
@@ -113,6 +116,141 @@ DATABASES = {
     }
 }
 
+# Connexions à PostgreSQL, selon DB_CONNECTION_MODE :
+# - "persistent" (WSGI/gunicorn, défaut) : chaque thread garde sa connexion
+#   DB_CONN_MAX_AGE secondes, vérifiée avant réutilisation (CONN_HEALTH_CHECKS) ;
+# - "pool" (ASGI, cf. stream/asgi.py) : pool psycopg 3 partagé par le
+#   processus (psycopg[pool]), les connexions persistantes n'étant pas
+#   réutilisées d'une requête asynchrone à l'autre ;
+# - "none" : une connexion par requête (comportement historique).
+DB_CONNECTION_MODE = os.getenv("DB_CONNECTION_MODE", "persistent").lower()
+if DB_CONNECTION_MODE == "pool":
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # incompatible avec le pool
+    # Connexion vérifiée à sa sortie du pool (Django passe alors
+    # check=ConnectionPool.check_connection au pool)
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv("DB_POOL_MIN_SIZE", 2)),
+            'max_size': int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+            # Attente maximale (s) d'une connexion libre
+            'timeout': float(os.getenv("DB_POOL_TIMEOUT", 10)),
+            'max_idle': float(os.getenv("DB_POOL_MAX_IDLE", 600)),
+            'max_lifetime': float(os.getenv("DB_POOL_MAX_LIFETIME", 3600)),
+        },
+    }
+elif DB_CONNECTION_MODE == "persistent":
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv("DB_CONN_MAX_AGE", 60))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Réplicas en lecture (« hôte » ou « hôte:port », séparés par des virgules),
+# mêmes identifiants que la principale. Alias replica, replica_2, ... ;
+# seules les vues décorées par core.db_router.read_from_replica les lisent.
+DB_REPLICA_HOSTS = [host.strip() for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host.strip()]
+for index, replica_host in enumerate(DB_REPLICA_HOSTS, start=1):
+    replica_host, _, replica_port = replica_host.partition(':')
+    DATABASES['replica' if index == 1 else f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        # Tests : pas de base de test séparée pour un réplica
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# Durée (s) pendant laquelle un visiteur qui vient d'écrire lit sur la principale
+DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", 10))
+
+# Cache partagé entre les workers : Redis si REDIS_URL est défini
+# (ex. redis://localhost:6379/1), sinon cache mémoire local du processus
+# (développement, tests).
+REDIS_URL = os.getenv("REDIS_URL", "").strip()
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': os.getenv("CACHE_KEY_PREFIX", "stream"),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'stream',
+        }
+    }
+
+# Cache à deux niveaux (core.caching) : LRU du processus devant le cache
+# partagé, valeurs périmées servies CACHE_STALE_GRACE secondes pendant un
+# recalcul, verrou de recalcul de CACHE_LOCK_TIMEOUT secondes au plus
+CACHE_LOCAL_TTL = int(os.getenv("CACHE_LOCAL_TTL", 5))
+CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", 1024))
+CACHE_STALE_GRACE = int(os.getenv("CACHE_STALE_GRACE", 300))
+CACHE_LOCK_TIMEOUT = int(os.getenv("CACHE_LOCK_TIMEOUT", 30))
+CACHE_EARLY_EXPIRY_BETA = float(os.getenv("CACHE_EARLY_EXPIRY_BETA", 1.0))
+
+# Configuration PostgreSQL utilisée pour la recherche plein texte (core.search)
+SEARCH_CONFIG = os.getenv("SEARCH_CONFIG", "french")
+
+# Durée max (secondes) de mise en cache de l'abonnement d'un utilisateur (core.entitlements)
+ENTITLEMENT_CACHE_TTL = int(os.getenv("ENTITLEMENT_CACHE_TTL", 300))
+
+# Durée de vie (secondes) de l'instantané de la page d'accueil (core.homepage)
+HOMEPAGE_CACHE_TTL = int(os.getenv("HOMEPAGE_CACHE_TTL", 300))
+
+# Durée de vie (secondes) des cartes vidéo/photo en cache ({% cached_cards %})
+CARD_CACHE_TTL = int(os.getenv("CARD_CACHE_TTL", 600))
+
+# Délai (secondes) avant la suppression sur R2 d'un fichier remplacé : l'instantané
+# de la page d'accueil (périmé compris) et les cartes en cache peuvent encore
+# servir son URL jusqu'à leur expiration
+REPLACED_MEDIA_DELETE_DELAY = int(os.getenv(
+    "REPLACED_MEDIA_DELETE_DELAY", max(HOMEPAGE_CACHE_TTL + CACHE_STALE_GRACE, CARD_CACHE_TTL) + 60
+))
+
+# Miniatures générées après upload (core.thumbnails) : largeurs en pixels et formats
+THUMBNAIL_WIDTHS = [int(w) for w in os.getenv("THUMBNAIL_WIDTHS", "320,640,1280").split(',') if w.strip()]
+THUMBNAIL_FORMATS = [f.strip() for f in os.getenv("THUMBNAIL_FORMATS", "avif,webp,jpeg").split(',') if f.strip()]
+
+# File de tâches de fond (core.jobs) : délai de relance (base, plafond) et
+# durée après laquelle une tâche « en cours » d'un worker disparu est reprise
+JOB_RETRY_BASE_DELAY = int(os.getenv("JOB_RETRY_BASE_DELAY", 10))
+JOB_RETRY_MAX_DELAY = int(os.getenv("JOB_RETRY_MAX_DELAY", 3600))
+JOB_LOCK_TIMEOUT = int(os.getenv("JOB_LOCK_TIMEOUT", 900))
+# Intervalle (s) de mise à jour de locked_at des tâches en cours (< JOB_LOCK_TIMEOUT)
+JOB_HEARTBEAT_INTERVAL = int(os.getenv("JOB_HEARTBEAT_INTERVAL", 60))
+
+# Analyse des vidéos (core.probe) : taille des lectures partielles sur R2
+# et nombre maximum d'octets lus par fichier
+PROBE_CHUNK_SIZE = int(os.getenv("PROBE_CHUNK_SIZE", 64 * 1024))
+PROBE_MAX_BYTES = int(os.getenv("PROBE_MAX_BYTES", 8 * 1024 * 1024))
+
+# Packaging HLS (core.hls) : désactivé par défaut, nécessite ffmpeg sur les
+# machines qui exécutent run_jobs. HLS_LADDER : « hauteur:kbit/s » par qualité.
+HLS_ENABLED = os.getenv("HLS_ENABLED", "False").lower() == "true"
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+HLS_LADDER = [
+    tuple(int(v) for v in rung.split(':'))
+    for rung in os.getenv("HLS_LADDER", "1080:5000,720:2800,480:1400,360:800").split(',') if rung.strip()
+]
+HLS_SEGMENT_SECONDS = int(os.getenv("HLS_SEGMENT_SECONDS", 6))
+HLS_AUDIO_KBPS = int(os.getenv("HLS_AUDIO_KBPS", 128))
+HLS_X264_PRESET = os.getenv("HLS_X264_PRESET", "veryfast")
+HLS_TIMEOUT = int(os.getenv("HLS_TIMEOUT", 3600))
+HLS_WORK_DIR = os.getenv("HLS_WORK_DIR") or None
+
+# Ramasse-miettes R2 (commande gc_storage) : préfixes gérés par l'application
+# et âge minimum (heures) d'un objet avant de pouvoir être supprimé
+GC_PREFIXES = [
+    p.strip() for p in os.getenv(
+        "GC_PREFIXES", "videos/,video/,video_files/,covers/,cover/,photos/,photo/,derivatives/,hls/"
+    ).split(',') if p.strip()
+]
+GC_MIN_AGE_HOURS = int(os.getenv("GC_MIN_AGE_HOURS", 24))
+
+# Reconstruction complète (secondes) de l'index de suggestions en mémoire (core.suggest)
+SUGGEST_REBUILD_INTERVAL = int(os.getenv("SUGGEST_REBUILD_INTERVAL", 300))
+
 
 # --- Internationalisation ---
 LANGUAGE_CODE = 'fr-fr'
@@ -189,7 +327,28 @@ UNFOLD_DEFAULT_COUNTRY = 'FR'
 
 # Limites pour l'upload de gros fichiers (2 Go)
 DATA_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024 * 1024 * 2
-FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024 * 1024 * 2
+# Au-delà de ce seuil, Django écrit le fichier reçu sur disque au lieu de le garder en RAM
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv("FILE_UPLOAD_MAX_MEMORY_SIZE", 1024 * 1024 * 10))
+
+# Upload multipart vers R2 (core.storage) : taille d'une part et parts envoyées en parallèle
+R2_MULTIPART_PART_SIZE = int(os.getenv("R2_MULTIPART_PART_SIZE", 1024 * 1024 * 16))
+R2_MULTIPART_CONCURRENCY = int(os.getenv("R2_MULTIPART_CONCURRENCY", 4))
+# Validité (secondes) des URLs présignées des parts d'un upload multipart direct :
+# le client en redemande au fil de l'eau, elles peuvent rester courtes
+R2_MULTIPART_URL_EXPIRY = int(os.getenv("R2_MULTIPART_URL_EXPIRY", 3600))
+
+# Client R2 partagé par processus (core.storage) : pool de connexions, keep-alive et retries
+R2_MAX_POOL_CONNECTIONS = int(os.getenv("R2_MAX_POOL_CONNECTIONS", 32))
+R2_TCP_KEEPALIVE = os.getenv("R2_TCP_KEEPALIVE", "True").lower() == "true"
+R2_MAX_ATTEMPTS = int(os.getenv("R2_MAX_ATTEMPTS", 3))
+R2_RETRY_MODE = os.getenv("R2_RETRY_MODE", "standard")
+
+# Threads réservés au code bloquant appelé depuis les vues asynchrones (core.async_storage)
+ASYNC_BLOCKING_WORKERS = int(os.getenv("ASYNC_BLOCKING_WORKERS", 8))
+
+# Intervalle (secondes) de report en base des vues bufferisées (core.view_counter).
+# 0 = écriture immédiate à chaque vue.
+VIEW_COUNT_FLUSH_INTERVAL = int(os.getenv("VIEW_COUNT_FLUSH_INTERVAL", 10))
 
 # Configuration CORS
 # En développement, on autorise toutes les origines pour les tests.